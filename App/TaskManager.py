@@ -1,119 +1,460 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import sqlite3
 import os
-import random
-import pandas as pd
-from typing import Optional, List, Tuple
-from contextlib import contextmanager
-
-def _ean13_check_digit(twelve_digits: str) -> str:
-    if len(twelve_digits) != 12 or not twelve_digits.isdigit():
-        raise ValueError("EAN-13 requires 12 digits to compute check digit")
-    s_odd = sum(int(d) for d in twelve_digits[::2])
-    s_even = sum(int(d) for d in twelve_digits[1::2])
-    total = s_odd + 3 * s_even
-    return str((10 - (total % 10)) % 10)
-
-def is_valid_ean13(code: str) -> bool:
-    if len(code) != 13 or not code.isdigit():
-        return False
-    return _ean13_check_digit(code[:12]) == code[12]
-
-def make_random_ean13() -> str:
-    base = f"{random.randint(0, 999999999999):012}"
-    return base + _ean13_check_digit(base)
-
-def normalize_barcode_for_export(code: str) -> str:
-    if code is None:
-        return ''
-    s = str(code).strip()
-    if not s:
-        return ''
-    if s.isdigit() and len(s) == 12:
-        return s + _ean13_check_digit(s)
-    return s
-
-class Database:
-    
-    def __init__(self, db_path: str = './Database/tasks.db'):
-        self.db_path = db_path
-        self._ensure_database_exists()
-        
-    def _ensure_database_exists(self):
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            self._create_tables(cursor)
-            conn.commit()
-    
-    @contextmanager
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        try:
-            yield conn
-        finally:
-            conn.close()
-    
-    def _create_tables(self, cursor):
-        # Categories table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category_name TEXT UNIQUE NOT NULL
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                FullName TEXT NOT NULL,
-                ItemGroup TEXT,
-                ItemSuplier TEXT,
-                ItemStatus TEXT DEFAULT 'pending',
-                DateCreated DATETIME DEFAULT CURRENT_TIMESTAMP,
-                InStock INTEGER,
-                pvn_id INTEGER,
-                category_id INTEGER,
-                FOREIGN KEY(pvn_id) REFERENCES PVN(id),
-                FOREIGN KEY(category_id) REFERENCES categories(id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS barcode (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task_id INTEGER,
-                barcode TEXT UNIQUE,
-                barcode_type INTEGER DEFAULT 0,
-                is_primary INTEGER DEFAULT 1,
-                FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS price (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task_id INTEGER,
-                price DECIMAL(10, 2),
-                currency TEXT DEFAULT 'EUR',
-                price_type INTEGER DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
-                FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS PVN (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                price_id INTEGER,
-                pvn TEXT,
-                FOREIGN KEY(price_id) REFERENCES price(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_status ON tasks(ItemStatus)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_barcode ON barcode(barcode)')
+import threading
+import queue
+import itertools
+import csv
+import time
+from typing import Optional, Dict, List, Tuple
+from collections import deque
+
+from ean13 import is_valid_ean13
+from database import Database
+from query_profiler import OperationStats
+from reference_data import Categories
+from row_store import RowBlock, StringPool
+from task_repository import (
+    TaskRepository, TaskQuery, TaskRow, NewTask, TaskUpdate, DeltaExport, column_filter, LIST_COLUMNS,
+    CHD3050U_CSV_PATH, CHD3050U_DELTA_CSV_PATH
+)
+
+# Task List paging: rows per keyset page and how many pages stay in the Treeview
+PAGE_SIZE = 200
+MAX_PAGES = 3
+PAGE_EDGE = 0.1
+
+# Background database worker: result polling interval and how many SQLite VM
+# steps run between checks for a superseded job
+WORKER_POLL_MS = 30
+WORKER_PROGRESS_STEPS = 1000
+
+# Search-as-you-type: quiet period after the last key before the search runs
+SEARCH_DEBOUNCE_MS = 250
+
+# How often to check PRAGMA data_version for category changes by other processes
+REFERENCE_POLL_MS = 2000
+
+class PagedTreeview:
+    """Shows a TaskQuery in a Treeview, keeping only a few pages around the view loaded.
+
+    Items are keyed by task id and each loaded page is a RowBlock, so the
+    selected tasks' rows come from memory instead of the Treeview's values.
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 page_size: int = PAGE_SIZE, max_pages: int = MAX_PAGES, submit=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.max_pages = max_pages
+        # submit(job, on_done, on_error) runs a page fetch off the Tk thread;
+        # without it fetches run inline
+        self.submit = submit
+        # Set while a new result is being fetched elsewhere (see show); no
+        # page of the old one is fetched meanwhile
+        self.loading = False
+        self._fetching = False
+        self.source: Optional[TaskQuery] = None
+        # Rows in the whole result; None while it is still being counted
+        self.total: Optional[int] = 0
+        # Index of the first loaded row within the whole result
+        self.offset = 0
+        # Loaded pages, in list order; strings are interned across them
+        self.pages: deque = deque()
+        self.pool = StringPool()
+        self._extend_pending = False
+
+        self.tree.configure(yscrollcommand=self._on_yview)
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.tree.tag_configure('completed', background='#d4edda')
+
+    def load(self, source: TaskQuery) -> int:
+        self.show(source, source.count(), source.fetch_first(self.page_size))
+        return self.total
+
+    def show(self, source: TaskQuery, total: Optional[int], first_page: List[TaskRow]):
+        """Display a result whose first page (and count, if known) were fetched elsewhere."""
+        self.source = source
+        self.total = total
+        self.loading = False
+        self._fetching = False
+        self._reset(0, first_page)
+
+    def set_total(self, total: int):
+        """Supply the count of a result shown with total=None."""
+        self.total = total
+        self._on_yview(*self.tree.yview())
+
+    def _adjust_total(self, delta: int):
+        if self.total is not None:
+            self.total += delta
+
+    def _has_more(self) -> bool:
+        return self.total is None or self.offset + self.loaded_count() < self.total
+
+    def reload(self) -> int:
+        return self.load(self.source) if self.source else 0
+
+    def loaded_count(self) -> int:
+        return sum(len(page) for page in self.pages)
+
+    def row(self, task_id: int) -> Optional[TaskRow]:
+        """The loaded row of a task, e.g. a selected one."""
+        found = self._locate(task_id)
+        return self.pages[found[0]].row(found[1]) if found else None
+
+    def _locate(self, task_id: int) -> Optional[Tuple[int, int]]:
+        for p, page in enumerate(self.pages):
+            i = page.index(task_id)
+            if i is not None:
+                return p, i
+        return None
+
+    def _reset(self, offset: int, rows: List[TaskRow]):
+        self.tree.delete(*self.tree.get_children())
+        self.pages.clear()
+        self.pool = StringPool()
+        self.offset = offset
+        if rows:
+            self.pages.append(self._new_page(tk.END, rows))
+        self.tree.yview_moveto(0)
+
+    def _new_page(self, index, rows: List[TaskRow]) -> RowBlock:
+        """Insert rows as items from index on (or at the end) and store them."""
+        self._drop_loaded(rows)
+        for i, row in enumerate(rows):
+            self._insert(index if index == tk.END else index + i, row)
+        return RowBlock(rows, self.pool)
+
+    def _insert(self, index, row: TaskRow):
+        self.tree.insert("", index, iid=str(row[0]), values=row[:len(LIST_COLUMNS)],
+                         tags=(self._tag(row),))
+
+    @staticmethod
+    def _tag(row: TaskRow) -> str:
+        # Color-code completed tasks
+        return 'completed' if row[4] == 'completed' else ''
+
+    def _drop_loaded(self, rows: List[TaskRow]):
+        # A task fetched again moved in the order since its page was loaded;
+        # items are keyed by id, so the stale copy goes
+        ids = {row[0] for row in rows}
+        for p in reversed(range(len(self.pages))):
+            page = self.pages[p]
+            if any(task_id in ids for task_id in page.ids):
+                self.tree.delete(*[str(task_id) for task_id in page.ids if task_id in ids])
+                self.pages[p] = RowBlock([r for r in page if r[0] not in ids], self.pool)
+                if not len(self.pages[p]):
+                    del self.pages[p]
+
+    def patch(self, task_id: int, row: Optional[TaskRow], old_row: Optional[TaskRow] = None):
+        """Reflect one changed task without reloading the list.
+
+        row is the task's current row under the active query (None once it is
+        deleted or no longer matches); old_row is its row before the change,
+        (None for a new task) needed to keep the count and offset right when
+        the task isn't loaded.
+        """
+        found = self._locate(task_id)
+        if found:
+            p, i = found
+            rows = self.pages[p].rows()
+            if row is not None and not self._moved(rows[i], row):
+                self.tree.item(str(task_id), values=row[:len(LIST_COLUMNS)], tags=(self._tag(row),))
+                rows[i] = row
+                self.pages[p] = RowBlock(rows, self.pool)
+                return
+            # Deleted, or its sort value changed: take it out, and place a
+            # moved row again below as if it were new
+            self.tree.delete(str(task_id))
+            del rows[i]
+            self._adjust_total(-1)
+            self.pages[p] = RowBlock(rows, self.pool)
+            if not rows:
+                del self.pages[p]
+        elif old_row is not None:
+            # Counted but not loaded: take it out as if deleted, so placing
+            # row below counts it once again (an edit leaves total as it was)
+            self._adjust_total(-1)
+            if self._before_window(old_row):
+                self.offset -= 1
+        if row is None:
+            return
+
+        self._adjust_total(1)
+        key = self.source.sort_key(row) if self.source else None
+        if key is None:
+            return
+        if not self.pages:
+            self.pages.append(self._new_page(tk.END, [row]))
+            return
+        if self._before_window(row):
+            self.offset += 1
+            return
+        index = 0
+        for p, page in enumerate(self.pages):
+            rows = page.rows()
+            for i, r in enumerate(rows):
+                if self.source.sort_key(r) > key:
+                    self._insert(index, row)
+                    rows.insert(i, row)
+                    self.pages[p] = RowBlock(rows, self.pool)
+                    return
+                index += 1
+        # Past the last loaded row: only show it if the window reaches the end
+        if self.total is not None and self.offset + self.loaded_count() == self.total - 1:
+            self._insert(tk.END, row)
+            self.pages[-1] = RowBlock(self.pages[-1].rows() + [row], self.pool)
+
+    def patch_many(self, rows: Dict[int, Optional[TaskRow]]):
+        """Reflect a batch change to loaded tasks in one pass over the window.
+
+        rows maps each changed task id to its current row under the active
+        query, or None once it is deleted or no longer matches.
+        """
+        removed = []
+        moved = []
+        for p, page in enumerate(self.pages):
+            if not any(task_id in rows for task_id in page.ids):
+                continue
+            kept = []
+            for r in page:
+                if r[0] not in rows:
+                    kept.append(r)
+                elif rows[r[0]] is None:
+                    removed.append(str(r[0]))
+                elif self._moved(r, rows[r[0]]):
+                    removed.append(str(r[0]))
+                    moved.append(rows[r[0]])
+                else:
+                    row = rows[r[0]]
+                    self.tree.item(str(row[0]), values=row[:len(LIST_COLUMNS)], tags=(self._tag(row),))
+                    kept.append(row)
+            self.pages[p] = RowBlock(kept, self.pool)
+        if removed:
+            self.tree.delete(*removed)
+            self.pages = deque(page for page in self.pages if len(page))
+            self._adjust_total(-len(removed))
+            for row in moved:
+                self.patch(row[0], row)
+            self._on_yview(*self.tree.yview())
+
+    def _moved(self, old_row: TaskRow, row: TaskRow) -> bool:
+        """Whether a change moves the row in the list's sort order."""
+        if self.source is None:
+            return False
+        return self.source.sort_key(old_row) != self.source.sort_key(row)
+
+    def _before_window(self, row: TaskRow) -> bool:
+        key = self.source.sort_key(row) if self.source else None
+        first = self.pages[0].row(0) if self.pages and len(self.pages[0]) else None
+        return (key is not None and first is not None and self.offset > 0
+                and key < self.source.sort_key(first))
+
+    def _first_visible(self) -> int:
+        return round(self.tree.yview()[0] * self.loaded_count())
+
+    def _on_yview(self, first, last):
+        first, last = float(first), float(last)
+        loaded = self.loaded_count()
+        if self.total and loaded:
+            # Map the window position onto the whole result
+            self.scrollbar.set((self.offset + first * loaded) / self.total,
+                               min(1.0, (self.offset + last * loaded) / self.total))
+        else:
+            self.scrollbar.set(first, last)
+
+        if not self._extend_pending and (first <= PAGE_EDGE or last >= 1 - PAGE_EDGE):
+            self._extend_pending = True
+            self.tree.after_idle(self._extend)
+
+    def _fetch(self, job, apply):
+        """Run job() through submit and apply(rows) to the window it was for."""
+        source = self.source
+
+        def done(rows):
+            self._fetching = False
+            if self.source is source:
+                apply(rows)
+
+        def failed(error):
+            self._fetching = False
+
+        self._fetching = True
+        if self.submit is None:
+            done(job())
+        else:
+            self.submit(job, done, failed)
+
+    def _extend(self):
+        self._extend_pending = False
+        # One page at a time; the new page's yview change asks for the next
+        if self.source is None or not self.pages or self.loading or self._fetching:
+            return
+        source, size = self.source, self.page_size
+        first, last = self.tree.yview()
+        if last >= 1 - PAGE_EDGE and self._has_more():
+            anchor = self.pages[-1].row(-1)
+            self._fetch(lambda: source.fetch_after(anchor, size), lambda rows: self._append(anchor, rows))
+        elif first <= PAGE_EDGE and self.offset > 0:
+            anchor = self.pages[0].row(0)
+            self._fetch(lambda: source.fetch_before(anchor, size), lambda rows: self._prepend(anchor, rows))
+
+    def _append(self, anchor: TaskRow, rows: List[TaskRow]):
+        if not self.pages or self.pages[-1].row(-1) != anchor:
+            # The window changed while the page was fetched: try again from it
+            self._on_yview(*self.tree.yview())
+            return
+        if rows:
+            self.pages.append(self._new_page(tk.END, rows))
+            if len(self.pages) > self.max_pages:
+                self._drop_first_page()
+
+    def _prepend(self, anchor: TaskRow, rows: List[TaskRow]):
+        if not self.pages or self.pages[0].row(0) != anchor:
+            self._on_yview(*self.tree.yview())
+            return
+        if rows:
+            top = self._first_visible()
+            self.pages.appendleft(self._new_page(0, rows))
+            self.offset = max(0, self.offset - len(rows))
+            self.tree.yview_moveto((top + len(rows)) / self.loaded_count())
+            if len(self.pages) > self.max_pages:
+                self._drop_last_page()
+
+    def _drop_first_page(self):
+        top = self._first_visible()
+        page = self.pages.popleft()
+        self.tree.delete(*[str(task_id) for task_id in page.ids])
+        self.offset += len(page)
+        self.tree.yview_moveto(max(0, top - len(page)) / max(1, self.loaded_count()))
+
+    def _drop_last_page(self):
+        page = self.pages.pop()
+        self.tree.delete(*[str(task_id) for task_id in page.ids])
+
+    def _on_scrollbar(self, *args):
+        if not args or args[0] != 'moveto' or self.source is None or self.total is None:
+            self.tree.yview(*args)
+            return
+        target = int(float(args[1]) * self.total)
+        loaded = self.loaded_count()
+        if loaded and self.offset <= target < self.offset + loaded:
+            self.tree.yview_moveto((target - self.offset) / loaded)
+            return
+        if self.loading:
+            return
+        # Jump outside the loaded window: reposition it around the target. A
+        # later drag supersedes this fetch if it is still running
+        target = max(0, min(target, self.total - self.page_size))
+        source, size = self.source, self.page_size
+        self._fetch(lambda: source.fetch_at(target, size), lambda rows: self._reset(target, rows))
+
+class DatabaseWorker:
+    """Runs database jobs on a background thread and hands results back to Tk.
+
+    Jobs submitted with the same key supersede each other: a superseded job is
+    skipped if it hasn't started, aborted through SQLite's progress handler if
+    it is running, and its result is dropped.
+    """
+
+    def __init__(self, root, db: Database, on_busy=None, on_timing=None):
+        self.root = root
+        self.db = db
+        self.on_busy = on_busy
+        # on_timing(stats, started): after each on_done, with the job's DB stats
+        # and the perf_counter() time its on_done started
+        self.on_timing = on_timing
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._tickets = itertools.count(1)
+        self._latest = {}
+        self._current: Optional[Tuple[int, Optional[str]]] = None
+        self._pending = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+        self._poll_id = self.root.after(WORKER_POLL_MS, self._poll)
+
+    def submit(self, job, on_done=None, on_error=None, key: Optional[str] = None) -> int:
+        """Run job() off the Tk thread; on_done(result) or on_error(exc) run on the Tk thread."""
+        ticket = next(self._tickets)
+        if key is not None:
+            self._latest[key] = ticket
+        self._pending += 1
+        if self._pending == 1 and self.on_busy:
+            self.on_busy(True)
+        self._jobs.put((ticket, key, job, on_done, on_error))
+        return ticket
+
+    def cancel(self, key: str):
+        """Supersede every job submitted so far with this key."""
+        self._latest[key] = next(self._tickets)
+
+    def post(self, callback, *args):
+        """Schedule callback(*args) on the Tk thread; safe to call from a job."""
+        self._results.put((None, None, callback, args))
+
+    def is_superseded(self, ticket: int, key: Optional[str]) -> bool:
+        return key is not None and self._latest.get(key) != ticket
+
+    def _abort_superseded(self) -> int:
+        current = self._current
+        return 1 if self._stopping or (current and self.is_superseded(*current)) else 0
+
+    def _run(self):
+        with self.db.get_connection() as conn:
+            conn.set_progress_handler(self._abort_superseded, WORKER_PROGRESS_STEPS)
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            ticket, key, job, on_done, on_error = item
+            result, error, stats = None, None, None
+            if not self._stopping and not self.is_superseded(ticket, key):
+                self._current = (ticket, key)
+                try:
+                    with self.db.profiler.operation() as stats:
+                        result = job()
+                except Exception as e:
+                    error = e
+                finally:
+                    self._current = None
+            self._results.put((ticket, key, (on_done, on_error), (result, error, stats)))
+
+    def _poll(self):
+        while True:
+            try:
+                ticket, key, callbacks, args = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if ticket is None:
+                callbacks(*args)
+                continue
+
+            self._pending -= 1
+            if self._pending == 0 and self.on_busy:
+                self.on_busy(False)
+            if self.is_superseded(ticket, key):
+                continue
+            (on_done, on_error), (result, error, stats) = callbacks, args
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_done:
+                started = time.perf_counter()
+                on_done(result)
+                if self.on_timing and stats is not None:
+                    self.on_timing(stats, started)
+        self._poll_id = self.root.after(WORKER_POLL_MS, self._poll)
+
+    def stop(self):
+        self.root.after_cancel(self._poll_id)
+        self._stopping = True
+        self._jobs.put(None)
+        self._thread.join(timeout=2)
 
 class TaskApp:
     
@@ -125,9 +466,15 @@ class TaskApp:
         
         # Initialize database
         self.db = Database()
+        self.repo = TaskRepository(self.db)
+        self.reference = self.repo.reference
+        # Reports and the sharded export are imported on first use, see show_reports
+        self.reports = None
+        self.report_window: Optional[tk.Toplevel] = None
         
         # Load PVN values
-        self.pvn_values = self._load_pvn_values()
+        self.reference.set_pvn_values(self._load_pvn_values())
+        self.pvn_values = self.reference.pvn_values
         
         # Load categories
         self.load_categories()
@@ -139,12 +486,20 @@ class TaskApp:
         # Create GUI
         self.create_widgets()
         self.setup_keyboard_bindings()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Database work for the handlers runs off the Tk thread
+        self.worker = DatabaseWorker(self.root, self.db, on_busy=self.set_busy,
+                                     on_timing=self.show_timing)
+        self.worker.submit(self.repo.sync_external_changes)  # baseline data_version
         self.load_tasks()
+        self.root.after(REFERENCE_POLL_MS, self._poll_reference_data)
         
     def _load_pvn_values(self) -> List[str]:
         try:
-            df = pd.read_csv("./CSV/PVN.csv", header=None)
-            return df.iloc[:, 0].dropna().astype(str).str.strip().tolist()
+            # First field of each line; PVN.csv holds values like "21,00" unquoted
+            with open("./CSV/PVN.csv", newline="", encoding="utf-8-sig") as f:
+                return [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
         except FileNotFoundError:
             messagebox.showwarning("Warning", "PVN.csv not found. Using default values.")
             return ["0%", "5%", "12%", "21%"]
@@ -153,29 +508,57 @@ class TaskApp:
             return ["0%", "5%", "12%", "21%"]
     
     def load_categories(self):
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, category_name FROM categories ORDER BY category_name")
-            rows = cursor.fetchall()
-            
-            self.category_ids = [row[0] for row in rows]
-            self.category_names = [row[1] for row in rows]
+        self.categories: Categories = self.reference.load()
+        self.category_names = [name for _, name in self.categories.items]
     
     def get_selected_category_id(self) -> Optional[int]:
         try:
             index = self.category_combo.current()
-            if index >= 0 and index < len(self.category_ids):
-                return self.category_ids[index]
+            if index >= 0 and index < len(self.categories.items):
+                return self.categories.items[index][0]
         except:
             pass
         return None
     
     def set_category_by_id(self, category_id: int):
-        try:
-            index = self.category_ids.index(category_id)
+        index = self.categories.positions.get(category_id)
+        if index is not None:
             self.category_combo.current(index)
-        except (ValueError, AttributeError):
-            pass
+
+    def _poll_reference_data(self):
+        # data_version is polled on the worker, whose connection does every
+        # write the app makes and so only moves for other connections' commits
+        def check() -> Optional[Categories]:
+            if not self.repo.sync_external_changes():
+                return None
+            return self.reference.load()
+
+        def done(categories: Optional[Categories]):
+            if categories is None:
+                return
+            self._apply_categories(categories)
+            if self.report_window is not None:
+                self._refresh_reports()
+
+        self.worker.submit(check, done,
+                           lambda e: self.update_status(f"Failed to check for changes: {e}"),
+                           key="external-changes")
+        self.root.after(REFERENCE_POLL_MS, self._poll_reference_data)
+
+    def _apply_categories(self, categories: Categories):
+        if categories.items == self.categories.items:
+            return
+        selected = self.get_selected_category_id()
+        self.categories = categories
+        self.category_names = [name for _, name in categories.items]
+        self.category_combo.configure(values=self.category_names)
+        if selected in categories.positions:
+            self.set_category_by_id(selected)
+        elif self.category_names:
+            self.category_combo.current(0)
+        else:
+            self.category_combo.set("")
+        self.update_status("Categories updated")
 
     def create_widgets(self):
         self.root.grid_rowconfigure(0, weight=1)
@@ -199,7 +582,7 @@ class TaskApp:
         self.mode_button.pack(fill=tk.BOTH, expand=True, pady=(2, 0))
 
         # Labels with character counter for FullName
-        labels = ["FullName (max 25)", "Category", "InStock", "ItemSuplier", "PVN", "Price", "Barcode (Optional)", "Barcode Type"]
+        labels = ["FullName (max 25)", "Category", "InStock", "ItemSuplier", "PVN", "Price", "Barcode (Optional)", "Barcode Type", "Other Barcodes"]
         for i, label in enumerate(labels):
             tk.Label(input_frame, text=label).grid(row=i+1, column=0, padx=5, pady=5, sticky="w")
 
@@ -217,15 +600,18 @@ class TaskApp:
         self.barcode = tk.Entry(input_frame, width=25)
         self.barcode_type = ttk.Combobox(input_frame, values=["0 - EAN-13", "1 - UPC", "2 - Code128", "3 - QR"], width=23)
         self.barcode_type.current(0)
+        # Secondary (multipack) barcodes of the selected task, loaded on selection
+        self.secondary_barcodes = ttk.Combobox(input_frame, values=[], width=23, state="readonly")
+        self.secondary_barcodes.set("None")
 
         entries = [self.fullName, self.category_combo, self.inStock, self.itemSuplier, 
-                   self.pvn, self.price, self.barcode, self.barcode_type]
+                   self.pvn, self.price, self.barcode, self.barcode_type, self.secondary_barcodes]
         for i, entry in enumerate(entries):
             entry.grid(row=i+1, column=1, padx=5, pady=5, sticky="w")
 
         # Buttons
         button_frame = tk.Frame(input_frame)
-        button_frame.grid(row=9, column=0, columnspan=2, pady=(15, 0))
+        button_frame.grid(row=10, column=0, columnspan=2, pady=(15, 0))
         
         # Main action button (changes based on mode)
         self.action_button = tk.Button(button_frame, text="Add Task", command=self.handle_action, 
@@ -237,16 +623,28 @@ class TaskApp:
             ("Delete", self.delete_task, 1, 1, 12),
             ("Clear", self.clear_selection, 2, 0, 12),
             ("Refresh", self.load_tasks, 2, 1, 12),
-            ("Export CHD 3050U", self.export_to_chd3050u, 3, 0, 25)
+            ("Adjust Stock", self.adjust_stock, 3, 0, 12),
+            ("Set Price/PVN", self.set_price_pvn, 3, 1, 12),
+            ("Export CHD 3050U", self.export_to_chd3050u, 5, 0, 25),
+            ("Export Changes Only", self.export_chd3050u_changes, 6, 0, 25),
+            ("Export per Device", self.export_chd3050u_shards, 7, 0, 25),
+            ("Import CSV", self.import_from_csv, 8, 0, 25),
+            ("Reports", self.show_reports, 9, 0, 25)
         ]
         
         for text, command, row, col, width in buttons:
             btn = tk.Button(button_frame, text=text, command=command,
                            activebackground="blue", activeforeground="white", width=width)
-            if width == 25:  # Export button spans both columns
+            if width == 25:  # Export/Import buttons span both columns
                 btn.grid(row=row, column=col, columnspan=2, padx=3, pady=3)
             else:
                 btn.grid(row=row, column=col, padx=3, pady=3)
+
+        # Complete, Adjust Stock and Set Price/PVN on every task the Task List
+        # found, not just the selected (and loaded) ones
+        self.whole_result = tk.BooleanVar(value=False)
+        tk.Checkbutton(button_frame, text="Apply to whole result", variable=self.whole_result
+                       ).grid(row=4, column=0, columnspan=2, padx=3, pady=3)
             
         self.update_mode_ui()
 
@@ -256,10 +654,7 @@ class TaskApp:
         
         tk.Label(search_frame, text="Search by:").grid(row=0, column=0, padx=5, pady=5)
         
-        self.query = ttk.Combobox(search_frame, values=[
-            "by id", "by FullName", "by ItemGroup", "by ItemSuplier", 
-            "by ItemStatus", "by DateCreated", "by InStock", "All"
-        ], width=15)
+        self.query = ttk.Combobox(search_frame, values=list(TaskRepository.SEARCH_MODES), width=15)
         self.query.set("All")
         self.query.grid(row=0, column=1, padx=5, pady=5)
 
@@ -268,6 +663,11 @@ class TaskApp:
         self.searchQuery = tk.Entry(search_frame, width=25)
         self.searchQuery.grid(row=0, column=3, padx=5, pady=5)
         self.searchQuery.bind('<Return>', lambda e: self.search_for_tasks())
+        # Live search while typing or changing the mode
+        self._search_after_id = None
+        self._last_search: Optional[Tuple[str, str]] = None
+        self.searchQuery.bind('<KeyRelease>', self._schedule_live_search)
+        self.query.bind('<<ComboboxSelected>>', self._schedule_live_search)
         
         tk.Button(search_frame, text="Search", command=self.search_for_tasks,
                  activebackground="blue", activeforeground="white", width=12
@@ -287,9 +687,10 @@ class TaskApp:
         columns = ("id", "FullName", "ItemGroup", "ItemSuplier", "ItemStatus", 
                    "DateCreated", "InStock", "Barcode", "Price", "PVN")
         self.tree = ttk.Treeview(tree_frame, columns=columns, selectmode=tk.EXTENDED, 
-                                 show="headings", height=15, yscrollcommand=scrollbar.set)
+                                 show="headings", height=15)
         
-        scrollbar.config(command=self.tree.yview)
+        # Only a window of pages is kept in the tree; the pager drives the scrollbar
+        self.pager = PagedTreeview(self.tree, scrollbar, submit=self._submit_page)
         
         # Configure columns with appropriate widths
         column_config = {
@@ -305,18 +706,33 @@ class TaskApp:
             "PVN": (60, "PVN")
         }
         
+        # Clicking a heading sorts by that column (again: reverses), right-click
+        # filters it; both run in SQL, see TaskRepository.search
+        self.sort_column = "id"
+        self.sort_descending = True
+        self.column_filters: Dict[str, str] = {}
+        self.column_fields = dict(zip(columns, TaskRow._fields))
+        self.column_headings: Dict[str, str] = {}
         for col in columns:
             width, heading = column_config.get(col, (100, col.capitalize()))
-            self.tree.heading(col, text=heading)
+            self.column_headings[col] = heading
+            self.tree.heading(col, text=heading, command=lambda c=col: self.sort_by(c))
             self.tree.column(col, width=width)
+        self._update_headings()
         
         self.tree.grid(row=0, column=0, sticky="nsew")
         self.tree.bind('<ButtonRelease-1>', self.on_item_select)
         self.tree.bind('<Double-Button-1>', lambda e: self.handle_update())
+        self.tree.bind('<Button-3>', self.on_heading_right_click)
         
-        # Status bar
-        self.status_label = tk.Label(tree_frame, text="Ready", anchor="w", relief=tk.SUNKEN)
-        self.status_label.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        # Status bar with a busy indicator while database jobs run
+        status_frame = tk.Frame(tree_frame)
+        status_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.status_label = tk.Label(status_frame, text="Ready", anchor="w", relief=tk.SUNKEN)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.busy_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=80)
+        # DB vs UI time of the last operation, toggled with F12
+        self.timing_label = tk.Label(status_frame, text="DB - | UI -", anchor="e", relief=tk.SUNKEN)
     
     def _check_fullname_length(self, event=None):
         current = self.fullName.get()
@@ -331,6 +747,7 @@ class TaskApp:
         self.root.bind('<Delete>', lambda e: self.delete_task())
         self.root.bind('<F5>', lambda e: self.load_tasks())
         self.root.bind('<Control-m>', lambda e: self.toggle_mode())
+        self.root.bind('<F12>', lambda e: self.toggle_timing())
         
         # Enter key navigation between fields
         fields = [self.fullName, self.category_combo, self.inStock, self.itemSuplier, 
@@ -353,6 +770,7 @@ class TaskApp:
         if self.category_names:
             self.category_combo.current(0)
         self.barcode_type.current(0)
+        self._show_secondary_barcodes([])
         self.selected_id = None
 
         if self.edit_mode:
@@ -432,7 +850,7 @@ class TaskApp:
             return False
 
         # Check PVN selection
-        if self.pvn.get() in ["Select PVN", ""] or self.pvn.get() not in self.pvn_values:
+        if self.pvn.get() in ["Select PVN", ""] or not self.reference.is_valid_pvn(self.pvn.get()):
             messagebox.showwarning("Validation Error", "Please select a valid PVN!")
             return False
         
@@ -453,113 +871,177 @@ class TaskApp:
             return
         self.update_task()
 
+    def _form_values(self) -> NewTask:
+        """Read the input form; raises ValueError on unparsable numbers."""
+        barcode_type_str = self.barcode_type.get()
+        return NewTask(
+            FullName=self.fullName.get().strip(),
+            category_id=self.get_selected_category_id(),
+            ItemSuplier=self.itemSuplier.get().strip(),
+            InStock=int(self.inStock.get().strip()),
+            price=float(self.price.get().strip()),
+            pvn=self.pvn.get().strip(),
+            barcode=self.barcode.get().strip(),
+            barcode_type=int(barcode_type_str.split(' - ')[0]) if barcode_type_str else 0,
+        )
+
     def add_task(self):
         try:
-            title = self.fullName.get().strip()
-            category_id = self.get_selected_category_id()
-            quantity = int(self.inStock.get().strip())
-            suplier = self.itemSuplier.get().strip()
-            price = float(self.price.get().strip())
-            pvn = self.pvn.get().strip()
-            barcode_input = self.barcode.get().strip()
-            barcode = barcode_input if barcode_input else make_random_ean13()
-            barcode_type_str = self.barcode_type.get()
-            barcode_type = int(barcode_type_str.split(' - ')[0]) if barcode_type_str else 0
-
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get next available ID
-                cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tasks")
-                next_id = cursor.fetchone()[0]
-                
-                # Insert price
-                cursor.execute("INSERT INTO price (task_id, price) VALUES (?, ?)", 
-                              (next_id, price))
-                price_id = cursor.lastrowid
-                
-                # Insert PVN
-                cursor.execute("INSERT INTO PVN (price_id, pvn) VALUES (?, ?)", 
-                              (price_id, pvn))
-                pvn_id = cursor.lastrowid
-                
-                # Get category name for ItemGroup (for backward compatibility)
-                cursor.execute("SELECT category_name FROM categories WHERE id = ?", (category_id,))
-                category_name = cursor.fetchone()[0]
-                
-                # Insert task
-                cursor.execute(
-                    "INSERT INTO tasks (id, FullName, ItemGroup, ItemSuplier, InStock, pvn_id, category_id) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (next_id, title, category_name, suplier, quantity, pvn_id, category_id)
-                )
-                
-                # Insert barcode
-                cursor.execute("INSERT INTO barcode (task_id, barcode, barcode_type) VALUES (?, ?, ?)",
-                              (next_id, barcode, barcode_type))
-                
-                conn.commit()
-            
-            self.clear_selection()
-            self.load_tasks()
-            self.update_status(f"Task '{title}' added successfully")
-            messagebox.showinfo("Success", "Task added successfully!")
-            
-        except sqlite3.IntegrityError as e:
-            messagebox.showerror("Error", f"Barcode already exists: {e}")
+            # An empty barcode is allocated by the repository
+            task = self._form_values()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add task: {e}")
+            return
+
+        source = self.pager.source
+
+        def insert():
+            task_id, = self.repo.add_many([task])
+            return task_id, self._fetch_listed(source, task_id)
+
+        def done(result):
+            self.clear_selection()
+            self._patch_list(source, *result)
+            self.update_status(f"Task '{task.FullName}' added successfully")
+            messagebox.showinfo("Success", "Task added successfully!")
+
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError):
+                messagebox.showerror("Error", f"Barcode already exists: {e}")
+            else:
+                messagebox.showerror("Error", f"Failed to add task: {e}")
+
+        self.worker.submit(insert, done, failed)
 
     def load_tasks(self):
-        try:
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-            
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        t.id,
-                        t.FullName,
-                        t.ItemGroup,
-                        t.ItemSuplier,
-                        t.ItemStatus,
-                        t.DateCreated,
-                        t.InStock,
-                        COALESCE(b.barcode, ''),
-                        COALESCE(p.price, 0),
-                        COALESCE(pvn.pvn, '')
-                    FROM tasks t
-                    LEFT JOIN barcode b ON t.id = b.task_id
-                    LEFT JOIN price p ON t.id = p.task_id
-                    LEFT JOIN PVN pvn ON t.pvn_id = pvn.id
-                    ORDER BY t.id DESC
-                """)
-                tasks = cursor.fetchall()
-                
-                for row in tasks:
-                    # Color-code completed tasks
-                    tag = 'completed' if row[4] == 'completed' else ''
-                    self.tree.insert("", tk.END, values=row, tags=(tag,))
-                
-                self.tree.tag_configure('completed', background='#d4edda')
-                
-                self.update_status(f"Loaded {len(tasks)} tasks")
-                
-        except Exception as e:
+        self._last_search = None
+        self._load_list(self._make_source("All", ""), "Loaded {} tasks", "Failed to load tasks")
+
+    def _make_source(self, mode: str, term: str):
+        """Job building the Search frame query in the Task List's current sort and filters."""
+        sort = self.column_fields[self.sort_column]
+        descending = self.sort_descending
+        filters = {self.column_fields[col]: text for col, text in self.column_filters.items()}
+        return lambda: self.repo.search(mode, term, sort, descending, filters)
+
+    def _reload_list(self):
+        """Show the current search (or all tasks) again, e.g. after a sort or filter change."""
+        if self._last_search is None:
+            self.load_tasks()
+            return
+        mode, term = self._last_search
+        self._load_list(self._make_source(mode, term), "Found {} tasks", "Search failed")
+
+    def sort_by(self, column: str):
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column, self.sort_descending = column, False
+        self._update_headings()
+        self._reload_list()
+
+    def on_heading_right_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != "heading":
+            return
+        column = self.tree.column(self.tree.identify_column(event.x), "id")
+        text = simpledialog.askstring(
+            "Filter", f"Show {self.column_headings[column]} starting with\n"
+                      f"(any case; numbers: 5, >5, <=5 or 5-10; =text for an exact match; empty clears):",
+            initialvalue=self.column_filters.get(column, ""), parent=self.root
+        )
+        if text is None:
+            return
+        text = text.strip()
+        if text:
+            try:
+                column_filter(self.column_fields[column], text)
+            except ValueError as e:
+                messagebox.showwarning("Validation Error", str(e))
+                return
+            self.column_filters[column] = text
+        else:
+            self.column_filters.pop(column, None)
+        self._update_headings()
+        self._reload_list()
+
+    def _update_headings(self):
+        for col, heading in self.column_headings.items():
+            arrow = (" \u25bc" if self.sort_descending else " \u25b2") if col == self.sort_column else ""
+            marker = " *" if col in self.column_filters else ""
+            self.tree.heading(col, text=heading + arrow + marker)
+
+    def _load_list(self, make_source, status: str, error: str):
+        """Fetch and show the first page in the background, then count the rest.
+
+        A newer load or search supersedes one still in flight, including its count.
+        """
+        page_size = self.pager.page_size
+        self.worker.cancel("task-count")
+        # Until done, scrolling mustn't fetch pages: they'd supersede this load
+        self.pager.loading = True
+
+        def fetch():
+            source = make_source()
+            return source, source.fetch_first(page_size)
+
+        def done(result):
+            source, rows = result
+            if len(rows) < page_size:
+                self.pager.show(source, len(rows), rows)
+                self.update_status(status.format(len(rows)))
+            else:
+                # A full first page: show it now, the count follows
+                self.pager.show(source, None, rows)
+                self.update_status(status.format(f"{len(rows)}+"))
+                self.worker.submit(source.count, lambda total: counted(source, total),
+                                   lambda e: messagebox.showerror("Error", f"{error}: {e}"),
+                                   key="task-count")
+            self.root.event_generate("<<TaskListLoaded>>")
+
+        def counted(source, total):
+            if self.pager.source is source:
+                self.pager.set_total(total)
+                self.update_status(status.format(total))
+
+        def failed(e):
+            self.pager.loading = False
+            messagebox.showerror("Error", f"{error}: {e}")
+
+        self.worker.submit(fetch, done, failed, key="task-list")
+
+    def _submit_page(self, job, on_done, on_error):
+        """Task List page fetches, under the list's key: a newer drag or load supersedes them."""
+        def failed(e):
+            on_error(e)
             messagebox.showerror("Error", f"Failed to load tasks: {e}")
 
+        self.worker.submit(job, on_done, failed, key="task-list")
+
+    def _fetch_listed(self, source: Optional[TaskQuery], task_id: int) -> Optional[TaskRow]:
+        """Worker side of _patch_list: the task's row under the list's query."""
+        return source.fetch_row(task_id) if source else None
+
+    def _patch_list(self, source: Optional[TaskQuery], task_id: int, row: Optional[TaskRow],
+                    old_row: Optional[TaskRow] = None):
+        """Update just the changed task in the Task List after a write."""
+        if source is None:
+            self.load_tasks()
+        elif self.pager.source is source:
+            self.pager.patch(task_id, row, old_row)
+        # Otherwise a newer load is in flight and will include the change
+
     def on_item_select(self, event):
         selection = self.tree.selection()
         if not selection:
             return
         
-        item = self.tree.item(selection[0])
-        values = item['values']
-        if not values:
+        # Items are keyed by task id; the row, with the edit form's category
+        # and barcode type, is already in memory
+        task_id = int(selection[0])
+        row = self.pager.row(task_id)
+        if row is None:
             return
 
-        task_id = values[0]
         self.selected_id = task_id
         
         if not self.edit_mode:
@@ -567,43 +1049,49 @@ class TaskApp:
             self.update_mode_ui()
         
         try:
-            # Fetch full task details including category_id and barcode_type
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT t.category_id, b.barcode_type
-                    FROM tasks t
-                    LEFT JOIN barcode b ON t.id = b.task_id
-                    WHERE t.id = ?
-                """, (task_id,))
-                result = cursor.fetchone()
-                category_id = result[0] if result else None
-                barcode_type = result[1] if result and result[1] is not None else 0
-            
             self.fullName.delete(0, tk.END)
-            self.fullName.insert(0, str(values[1]))
+            self.fullName.insert(0, str(row.FullName))
             
             # Set category by ID
-            if category_id:
-                self.set_category_by_id(category_id)
+            if row.category_id:
+                self.set_category_by_id(row.category_id)
             
             self.itemSuplier.delete(0, tk.END)
-            self.itemSuplier.insert(0, str(values[3]))
+            self.itemSuplier.insert(0, str(row.ItemSuplier))
             self.inStock.delete(0, tk.END)
-            self.inStock.insert(0, str(values[6]))
+            self.inStock.insert(0, str(row.InStock))
             self.barcode.delete(0, tk.END)
-            self.barcode.insert(0, str(values[7]))
+            self.barcode.insert(0, str(row.barcode))
             self.price.delete(0, tk.END)
-            self.price.insert(0, str(values[8]))
-            self.pvn.set(str(values[9]))
+            self.price.insert(0, str(row.price))
+            self.pvn.set(str(row.pvn))
             
             # Set barcode type
-            self.barcode_type.current(barcode_type)
+            self.barcode_type.current(row.barcode_type or 0)
             
             self.update_status(f"Editing task ID: {task_id}")
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load task details: {e}")
+            return
+
+        # Secondary barcodes are only needed for the selected task; fetch them lazily
+        def done(barcodes):
+            if self.selected_id == task_id:
+                self._show_secondary_barcodes(barcodes)
+
+        self._show_secondary_barcodes([])
+        self.worker.submit(lambda: self.repo.list_secondary_barcodes(task_id), done,
+                           lambda e: self.update_status(f"Failed to load barcodes: {e}"),
+                           key="selection")
+
+    def _show_secondary_barcodes(self, barcodes: List[Tuple[str, int]]):
+        labels = self.barcode_type.cget("values")
+        self.secondary_barcodes.configure(values=[
+            f"{code} ({labels[barcode_type] if 0 <= barcode_type < len(labels) else barcode_type})"
+            for code, barcode_type in barcodes
+        ])
+        self.secondary_barcodes.set(f"{len(barcodes)} more" if barcodes else "None")
 
     def update_task(self):
         if self.selected_id is None:
@@ -611,218 +1099,480 @@ class TaskApp:
         
         try:
             task_id = self.selected_id
-            title = self.fullName.get().strip()
-            category_id = self.get_selected_category_id()
-            quantity = int(self.inStock.get().strip())
-            suplier = self.itemSuplier.get().strip()
-            price = float(self.price.get().strip())
-            pvn = self.pvn.get().strip()
-            barcode = self.barcode.get().strip()
-            barcode_type_str = self.barcode_type.get()
-            barcode_type = int(barcode_type_str.split(' - ')[0]) if barcode_type_str else 0
-
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get category name for ItemGroup
-                cursor.execute("SELECT category_name FROM categories WHERE id = ?", (category_id,))
-                category_name = cursor.fetchone()[0]
-                
-                # Update task
-                cursor.execute(
-                    "UPDATE tasks SET FullName = ?, ItemGroup = ?, ItemSuplier = ?, InStock = ?, category_id = ? "
-                    "WHERE id = ?",
-                    (title, category_name, suplier, quantity, category_id, task_id)
-                )
-                
-                # Update price
-                cursor.execute("UPDATE price SET price = ? WHERE task_id = ?", 
-                              (price, task_id))
-                
-                # Update PVN
-                cursor.execute("""
-                    UPDATE PVN SET pvn = ? 
-                    WHERE price_id IN (SELECT id FROM price WHERE task_id = ?)
-                """, (pvn, task_id))
-                
-                # Update barcode if provided
-                if barcode:
-                    cursor.execute("UPDATE barcode SET barcode = ?, barcode_type = ? WHERE task_id = ?", 
-                                  (barcode, barcode_type, task_id))
-                
-                conn.commit()
-            
-            self.load_tasks()
-            self.update_status(f"Task '{title}' updated successfully")
+            update = TaskUpdate(task_id, *self._form_values())
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to update task: {e}")
+            return
+
+        source = self.pager.source
+
+        def save():
+            old_row = self._fetch_listed(source, task_id)
+            self.repo.update_many([update])
+            return old_row, self._fetch_listed(source, task_id)
+
+        def done(result):
+            old_row, row = result
+            self._patch_list(source, task_id, row, old_row)
+            self.update_status(f"Task '{update.FullName}' updated successfully")
             messagebox.showinfo("Success", "Task updated successfully!")
             
             # Clear and switch back to add mode after update
             self.clear_selection()
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update task: {e}")
+
+        self.worker.submit(save, done,
+                           lambda e: messagebox.showerror("Error", f"Failed to update task: {e}"))
+
+    def _selected_ids(self) -> List[int]:
+        """Ids of all tasks selected in the Task List (the edited task if none)."""
+        ids = [int(item) for item in self.tree.selection()]
+        if not ids and self.selected_id is not None:
+            ids = [self.selected_id]
+        return ids
+
+    def _batch_ids(self, warning: str) -> Optional[Tuple[Optional[List[int]], int]]:
+        """(task ids, how many) for a batch action, or None after telling the user why not.
+
+        With "Apply to whole result" ticked the ids are None: _run_batch
+        collects them from the Task List's query on the worker.
+        """
+        if self.whole_result.get() and self.pager.source is not None:
+            total = self.pager.total
+            if total is None:
+                messagebox.showinfo("Please Wait", "The Task List is still counting its result, "
+                                                   "try again in a moment.")
+                return None
+            if not total:
+                messagebox.showwarning("Warning", "The Task List result is empty!")
+                return None
+            return None, total
+        task_ids = self._selected_ids()
+        if not task_ids:
+            messagebox.showwarning("Warning", warning)
+            return None
+        return task_ids, len(task_ids)
+
+    def _run_batch(self, task_ids: Optional[List[int]], write, done, error_message: str):
+        """Run one batch write on the worker, then patch the Task List once.
+
+        task_ids None writes every task in the Task List's current result,
+        which is then shown again rather than patched row by row.
+        """
+        source = self.pager.source
+
+        def job():
+            if task_ids is None:
+                return write(source.fetch_ids()), None
+            result = write(task_ids)
+            return result, source.fetch_rows(task_ids) if source else None
+
+        def finish(outcome):
+            result, rows = outcome
+            if task_ids is None:
+                if self.pager.source is source:
+                    self._reload_list()
+            elif source is None:
+                self.load_tasks()
+            elif self.pager.source is source:
+                self.pager.patch_many({task_id: rows.get(task_id) for task_id in task_ids})
+            # Otherwise a newer load is in flight and will include the change
+            done(result)
+
+        self.worker.submit(job, finish, lambda e: messagebox.showerror("Error", f"{error_message}: {e}"))
 
     def delete_task(self):
-        """Delete selected task from database."""
-        if self.selected_id is None:
+        """Delete the selected tasks from database."""
+        task_ids = self._selected_ids()
+        if not task_ids:
             messagebox.showwarning("Warning", "Please select a task to delete!")
             return
         
-        if not messagebox.askyesno("Confirm Delete", 
-                                   "Are you sure you want to delete this task?"):
+        question = ("Are you sure you want to delete this task?" if len(task_ids) == 1
+                    else f"Are you sure you want to delete {len(task_ids)} tasks?")
+        if not messagebox.askyesno("Confirm Delete", question):
             return
-        
-        try:
-            task_id = self.selected_id
-            
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get task name for status message
-                cursor.execute("SELECT FullName FROM tasks WHERE id = ?", (task_id,))
-                task_name = cursor.fetchone()[0]
-                
-                # Delete task (cascading will handle related records)
-                cursor.execute("DELETE FROM barcode WHERE task_id = ?", (task_id,))
-                cursor.execute("DELETE FROM price WHERE task_id = ?", (task_id,))
-                cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-                
-                conn.commit()
-            
+
+        def done(names):
             self.clear_selection()
-            self.load_tasks()
-            self.update_status(f"Task '{task_name}' deleted")
-            messagebox.showinfo("Success", "Task deleted successfully!")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete task: {e}")
+            if len(task_ids) == 1:
+                self.update_status(f"Task '{names.get(task_ids[0], '')}' deleted")
+                messagebox.showinfo("Success", "Task deleted successfully!")
+            else:
+                self.update_status(f"{len(names)} tasks deleted")
+                messagebox.showinfo("Success", f"{len(names)} tasks deleted successfully!")
+
+        self._run_batch(task_ids, self.repo.delete_many, done, "Failed to delete task")
 
     def mark_complete(self):
-        """Mark selected task as completed."""
-        if self.selected_id is None:
-            messagebox.showwarning("Warning", "Please select a task to mark as complete!")
+        """Mark the selected tasks (or the whole result) as completed."""
+        batch = self._batch_ids("Please select a task to mark as complete!")
+        if batch is None:
             return
-        
-        try:
-            task_id = self.selected_id
-            
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE tasks SET ItemStatus = ? WHERE id = ?", 
-                              ("completed", task_id))
-                conn.commit()
-            
-            self.load_tasks()
-            self.update_status("Task marked as completed")
-            messagebox.showinfo("Success", "Task marked as completed!")
+        task_ids, count = batch
+        if task_ids is None and not messagebox.askyesno(
+                "Confirm Complete", f"Mark all {count} tasks in the result as completed?"):
+            return
+
+        def done(_):
+            if count == 1:
+                self.update_status("Task marked as completed")
+                messagebox.showinfo("Success", "Task marked as completed!")
+            else:
+                self.update_status(f"{count} tasks marked as completed")
+                messagebox.showinfo("Success", f"{count} tasks marked as completed!")
             self.selected_id = None
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to mark task as complete: {e}")
+
+        self._run_batch(task_ids, self.repo.complete_many, done, "Failed to mark task as complete")
+
+    def adjust_stock(self):
+        """Add to (or take from) InStock of the selected tasks (or the whole result)."""
+        batch = self._batch_ids("Please select tasks to adjust!")
+        if batch is None:
+            return
+        task_ids, count = batch
+
+        delta = simpledialog.askinteger(
+            "Adjust Stock", f"Change InStock of {count} task(s) by\n(negative to remove):",
+            parent=self.root
+        )
+        if not delta:
+            return
+
+        def done(_):
+            self.update_status(f"InStock changed by {delta:+d} for {count} task(s)")
+
+        self._run_batch(task_ids, lambda ids: self.repo.adjust_stock_many(ids, delta), done,
+                        "Failed to adjust stock")
+
+    def set_price_pvn(self):
+        """Apply the form's Price and/or PVN to all selected tasks (or the whole result)."""
+        batch = self._batch_ids("Please select tasks to change!")
+        if batch is None:
+            return
+        task_ids, count = batch
+
+        # An empty Price or unselected PVN leaves that field as it is
+        price_text = self.price.get().strip()
+        pvn = self.pvn.get().strip()
+        if price_text and not price_text.replace('.', '', 1).isdigit():
+            messagebox.showwarning("Validation Error", "Non-numeric values in:\n• Price")
+            return
+        if pvn in ["Select PVN", ""]:
+            pvn = None
+        elif not self.reference.is_valid_pvn(pvn):
+            messagebox.showwarning("Validation Error", "Please select a valid PVN!")
+            return
+        price = float(price_text) if price_text else None
+        if price is None and pvn is None:
+            messagebox.showwarning("Warning", "Enter a Price or select a PVN to apply!")
+            return
+
+        changes = ", ".join(part for part in (
+            f"price {price:.2f}" if price is not None else "",
+            f"PVN {pvn}" if pvn is not None else "",
+        ) if part)
+        if not messagebox.askyesno("Confirm Change", f"Set {changes} on {count} task(s)?"):
+            return
+
+        def done(_):
+            self.update_status(f"Set {changes} on {count} task(s)")
+
+        self._run_batch(task_ids, lambda ids: self.repo.set_price_many(ids, price, pvn), done,
+                        "Failed to change price/PVN")
 
     def search_for_tasks(self):
         """Search for tasks based on selected criteria."""
         query_type = self.query.get().strip()
         search_term = self.searchQuery.get().strip()
         
+        if len(search_term) == 13 and is_valid_ean13(search_term):
+            self.scan_barcode(search_term)
+            return
+
+        if query_type not in TaskRepository.SEARCH_MODES:
+            messagebox.showwarning("Warning", "Please select a valid search query!")
+            return
+        
+        self._last_search = (query_type, search_term)
+        self._load_list(self._make_source(query_type, search_term), "Found {} tasks", "Search failed")
+
+    def _schedule_live_search(self, event=None):
+        if event is not None and getattr(event, "keysym", None) == "Return":
+            return  # Enter searches right away
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+            self._search_after_id = None
+        term = self.searchQuery.get().strip()
+        if len(term) == 13 and is_valid_ean13(term):
+            # Scanned barcode: no need to wait for more input
+            if ("by Barcode", term) != self._last_search:
+                self.scan_barcode(term)
+            return
+        self._search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self._live_search)
+
+    def _live_search(self):
+        self._search_after_id = None
+        query_type = self.query.get().strip()
+        search_term = self.searchQuery.get().strip()
+        # Skip half-typed modes, and keys that didn't change what the query
+        # returns (arrows, Shift, any typing while the mode is "All", ...)
+        if query_type not in TaskRepository.SEARCH_MODES:
+            return
+        last = self._last_search or ("All", "")
+        if self.repo.search_key(query_type, search_term) == self.repo.search_key(*last):
+            return
+        self.search_for_tasks()
+
+    def scan_barcode(self, barcode: str):
+        """Scanner fast path: show the product with this barcode and start editing it.
+
+        Runs on the Tk thread: an indexed point query (or cache hit) is quicker
+        than a round trip through the worker.
+        """
+        self.worker.cancel("task-list")
+        self.worker.cancel("task-count")
+        self.query.set("by Barcode")
+        self._last_search = ("by Barcode", barcode)
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                base_select = """
-                    SELECT 
-                        t.id,
-                        t.FullName,
-                        t.ItemGroup,
-                        t.ItemSuplier,
-                        t.ItemStatus,
-                        t.DateCreated,
-                        t.InStock,
-                        COALESCE(b.barcode, ''),
-                        COALESCE(p.price, 0),
-                        COALESCE(pvn.pvn, '')
-                    FROM tasks t
-                    LEFT JOIN barcode b ON t.id = b.task_id
-                    LEFT JOIN price p ON t.id = p.task_id
-                    LEFT JOIN PVN pvn ON t.pvn_id = pvn.id
-                """
-                
-                query_map = {
-                    "by id": (f"{base_select} WHERE t.id = ?", (search_term,)),
-                    "by FullName": (f"{base_select} WHERE t.FullName LIKE ?", (f'%{search_term}%',)),
-                    "by ItemGroup": (f"{base_select} WHERE t.ItemGroup LIKE ?", (f'%{search_term}%',)),
-                    "by ItemSuplier": (f"{base_select} WHERE t.ItemSuplier LIKE ?", (f'%{search_term}%',)),
-                    "by ItemStatus": (f"{base_select} WHERE t.ItemStatus = ?", (search_term,)),
-                    "by DateCreated": (f"{base_select} WHERE DATE(t.DateCreated) = ?", (search_term,)),
-                    "by InStock": (f"{base_select} WHERE t.InStock = ?", (search_term,)),
-                    "All": (f"{base_select} ORDER BY t.id DESC", ())
-                }
-                
-                if query_type not in query_map:
-                    messagebox.showwarning("Warning", "Please select a valid search query!")
-                    return
-                
-                sql, params = query_map[query_type]
-                cursor.execute(sql, params)
-                rows = cursor.fetchall()
-                
-                # Update treeview
-                for row in self.tree.get_children():
-                    self.tree.delete(row)
-                
-                for row in rows:
-                    tag = 'completed' if row[4] == 'completed' else ''
-                    self.tree.insert("", tk.END, values=row, tags=(tag,))
-                
-                self.tree.tag_configure('completed', background='#d4edda')
-                self.update_status(f"Found {len(rows)} tasks")
-                
+            row = self.repo.find_by_barcode(barcode)
         except Exception as e:
-            messagebox.showerror("Error", f"Search failed: {e}")
+            messagebox.showerror("Error", f"Barcode lookup failed: {e}")
+            return
+
+        self.pager.show(self.repo.search("by Barcode", barcode), 1 if row else 0, [row] if row else [])
+        # Select the term so the next scan replaces it
+        self.searchQuery.select_range(0, tk.END)
+        if row is None:
+            self.update_status(f"No product with barcode {barcode}")
+            return
+
+        item = str(row.id)
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+        self.on_item_select(None)
 
     def update_status(self, message: str):
         """Update status bar message."""
         self.status_label.config(text=message)
+
+    def set_busy(self, busy: bool):
+        """Show or hide the status bar busy indicator."""
+        if busy:
+            self.busy_bar.pack(side=tk.RIGHT, padx=(5, 0))
+            self.busy_bar.start(15)
+            self.root.config(cursor="watch")
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.root.config(cursor="")
+
+    def toggle_timing(self):
+        """Show or hide the DB/UI timing overlay; SQL profiling runs only while it's shown."""
+        profiler = self.db.profiler
+        profiler.enabled = not profiler.enabled
+        if profiler.enabled:
+            self.timing_label.pack(side=tk.RIGHT, padx=(5, 0))
+            self.update_status(f"SQL profiling on, slow queries (>{profiler.slow_ms:.0f} ms) "
+                               f"go to {profiler.log_path}")
+        else:
+            self.timing_label.pack_forget()
+            self.update_status("SQL profiling off")
+
+    def show_timing(self, stats: OperationStats, started: float):
+        if not self.db.profiler.enabled:
+            return
+
+        # UI time runs until Tk has processed the idle work (redraws) the
+        # callback queued
+        def done():
+            ui_ms = (time.perf_counter() - started) * 1000
+            self.timing_label.config(
+                text=f"DB {stats.db_ms:.1f} ms ({stats.statements} stmts, {stats.rows} rows) | UI {ui_ms:.1f} ms"
+            )
+        self.root.after_idle(done)
+
+    def on_close(self):
+        """Stop the worker, close the database connections and the window."""
+        self.worker.stop()
+        if self.reports is not None:
+            self.reports.close()
+        self.db.close()
+        self.root.destroy()
     
 
+    def import_from_csv(self):
+        csv_path = filedialog.askopenfilename(
+            title="Import products",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not csv_path:
+            return
+        
+        rejects_path = os.path.splitext(csv_path)[0] + "_rejects.csv"
+        
+        def progress(imported: int, rejected: int):
+            self.worker.post(self.update_status, f"Importing... {imported} added, {rejected} rejected")
+        
+        def done(result):
+            imported, rejected, unknown_categories = result
+            self.load_tasks()
+            self.update_status(f"Imported {imported} products, {rejected} rejected")
+            message = f"Imported {imported} products."
+            if unknown_categories:
+                names = ", ".join(f"{name} ({count})" for name, count in sorted(unknown_categories.items()))
+                message += (f"\n{sum(unknown_categories.values())} rows name a category that "
+                            f"doesn't exist: {names}")
+            if rejected:
+                message += f"\n{rejected} rows rejected, see:\n{rejects_path}"
+            messagebox.showinfo("Import", message)
+        
+        self.worker.submit(
+            lambda: self.repo.import_csv(csv_path, self.pvn_values, rejects_path, progress),
+            done, lambda e: messagebox.showerror("Error", f"Failed to import CSV: {e}")
+        )
+
     def export_to_chd3050u(self):
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        t.id,
-                        t.FullName,
-                        COALESCE(b.barcode, ''),
-                        COALESCE(p.price, 0),
-                        COALESCE(pvn.pvn, '')
-                    FROM tasks t
-                    LEFT JOIN barcode b ON t.id = b.task_id
-                    LEFT JOIN price p ON t.id = p.task_id
-                    LEFT JOIN PVN pvn ON t.pvn_id = pvn.id
-                    ORDER BY t.id ASC
-                """)
-                rows = cursor.fetchall()
-                if not rows:
-                    messagebox.showinfo("Info", "No data to export!")
-                    return
+        csv_path = CHD3050U_CSV_PATH
 
-                out_rows = []
-                for task_id, name, barcode, price, pvn in rows:
-                    name_capped = (name or "").strip()[:25]
-                    price_fmt = f"{float(price):.2f}".replace('.', ',')
-                    vat_val = str(pvn).strip()
-                    barcode_out = normalize_barcode_for_export(barcode)
-                    out_rows.append([task_id, name_capped, price_fmt, vat_val, barcode_out])
-
-                df = pd.DataFrame(out_rows, columns=["PLU", "NAME", "PRICE", "VAT", "BARCODE"])
-                os.makedirs("./CSV", exist_ok=True)
-                csv_path = "./CSV/chd3050u_plu.csv"
-                df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-                self.update_status(f"Exported {len(out_rows)} records to {csv_path}")
-                messagebox.showinfo("Success", f"CHD 3050U export created at:\n{csv_path}\nConfirm column mapping with your CHD import tool.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export CHD 3050U CSV: {e}")
+        def export():
+            return self.repo.export_chd3050u(csv_path, progress)
+
+        def progress(count: int):
+            self.worker.post(self.update_status, f"Exporting CHD 3050U... {count} records")
+
+        def done(count: int):
+            if not count:
+                messagebox.showinfo("Info", "No data to export!")
+                return
+            self.update_status(f"Exported {count} records to {csv_path}")
+            messagebox.showinfo("Success", f"CHD 3050U export created at:\n{csv_path}\nConfirm column mapping with your CHD import tool.")
+
+        # A second click restarts the export instead of running two at once;
+        # each export type has its own key so one never cancels another
+        self.worker.submit(export, done,
+                           lambda e: messagebox.showerror("Error", f"Failed to export CHD 3050U CSV: {e}"),
+                           key="export-full")
+
+    def export_chd3050u_changes(self):
+        """PLU lines changed since the last export, with deleted PLUs marked D."""
+        csv_path = CHD3050U_DELTA_CSV_PATH
+
+        def export():
+            return self.repo.export_chd3050u_delta(csv_path, progress)
+
+        def progress(count: int):
+            self.worker.post(self.update_status, f"Exporting CHD 3050U changes... {count} records")
+
+        def done(result: DeltaExport):
+            if not result.changed and not result.deleted:
+                messagebox.showinfo("Info", "No changes since the last export!")
+                return
+            self.update_status(f"Exported {result.changed} changed and {result.deleted} deleted "
+                               f"records to {csv_path}")
+            note = "\nNo earlier export was recorded, so every product is included." if result.full else ""
+            messagebox.showinfo("Success", f"CHD 3050U changes written to:\n{csv_path}{note}")
+
+        self.worker.submit(export, done,
+                           lambda e: messagebox.showerror("Error", f"Failed to export CHD 3050U changes: {e}"),
+                           key="export-delta")
+
+    def export_chd3050u_shards(self):
+        """One PLU file per device (or per category without a device map), written in parallel."""
+        # Pulls in multiprocessing and concurrent.futures; not needed at startup
+        from chd_export import CHD3050U_SHARD_DIR, MANIFEST_NAME, UNCATEGORIZED_SHARD, export_for_devices
+        out_dir = CHD3050U_SHARD_DIR
+
+        def export():
+            return export_for_devices(self.db, out_dir, progress=progress)
+
+        def progress(done: int, total: int, records: int):
+            self.worker.post(self.update_status,
+                             f"Exporting CHD 3050U shards... {done}/{total} ({records} records)")
+
+        def done(manifest: dict):
+            if not manifest["records"]:
+                messagebox.showinfo("Info", "No data to export!")
+                return
+            files = sum(1 for shard in manifest["shards"] if shard["file"])
+            uncategorized = (f", {manifest['uncategorized']} without a category"
+                             if manifest["uncategorized"] else "")
+            self.update_status(f"Exported {manifest['records']} records to {files} files "
+                               f"in {manifest['seconds']:.1f} s{uncategorized}")
+            note = (f"\n{manifest['uncategorized']} products without a known category are in "
+                    f"the {UNCATEGORIZED_SHARD} file." if manifest["uncategorized"] else "")
+            messagebox.showinfo("Success", f"{files} CHD 3050U files created in:\n{out_dir}\n"
+                                           f"See {MANIFEST_NAME} for the shard list.{note}")
+
+        self.worker.submit(export, done,
+                           lambda e: messagebox.showerror("Error", f"Failed to export CHD 3050U shards: {e}"),
+                           key="export-shards")
+
+    def show_reports(self):
+        """Stock value per category and its VAT split per PVN rate, kept open and current."""
+        if self.reports is None:
+            from reports import ReportCache
+            self.reports = ReportCache(self.db)
+        if self.report_window is not None:
+            self.report_window.lift()
+            self._refresh_reports()
+            return
+
+        window = self.report_window = tk.Toplevel(self.root)
+        window.title("Reports")
+        window.geometry("700x520")
+        window.protocol("WM_DELETE_WINDOW", self._close_reports)
+
+        report_tables = [
+            ("report_categories", " Stock value by category ", (
+                ("category", 200, "Category"), ("products", 90, "Products"),
+                ("units", 110, "Units"), ("value", 140, "Value"))),
+            ("report_pvn", " VAT by PVN rate ", (
+                ("pvn", 60, "PVN"), ("products", 90, "Products"), ("gross", 130, "Gross"),
+                ("net", 130, "Net"), ("vat", 130, "VAT"))),
+        ]
+        for row, (attr, title, columns) in enumerate(report_tables):
+            frame = tk.LabelFrame(window, text=title, padx=10, pady=10)
+            frame.grid(row=row, column=0, padx=10, pady=(10, 0), sticky="nsew")
+            window.grid_rowconfigure(row, weight=1)
+            tree = ttk.Treeview(frame, columns=[name for name, _, _ in columns],
+                                show="headings", height=8)
+            for name, width, heading in columns:
+                tree.heading(name, text=heading)
+                tree.column(name, width=width, anchor="w" if name == "category" else "e")
+            tree.pack(fill=tk.BOTH, expand=True)
+            setattr(self, attr, tree)
+        window.grid_columnconfigure(0, weight=1)
+
+        self.report_totals = tk.Label(window, text="Loading...", anchor="w")
+        self.report_totals.grid(row=2, column=0, padx=10, pady=10, sticky="ew")
+        self._shown_reports = None
+        self._refresh_reports()
+
+    def _close_reports(self):
+        self.worker.cancel("reports")
+        self.report_window.destroy()
+        self.report_window = None
+
+    def _refresh_reports(self):
+        # Cached until data_version moves, so this is cheap when nothing changed
+        self.worker.submit(self.reports.get, self._show_reports,
+                           lambda e: self.update_status(f"Failed to load reports: {e}"),
+                           key="reports")
+
+    def _show_reports(self, reports):
+        if self.report_window is None or reports is self._shown_reports:
+            return
+        self._shown_reports = reports
+        self.report_categories.delete(*self.report_categories.get_children())
+        for row in reports.categories:
+            self.report_categories.insert("", tk.END, values=(
+                row.category, row.products, row.units, f"{row.value:,.2f}"))
+        self.report_pvn.delete(*self.report_pvn.get_children())
+        for row in reports.pvn:
+            self.report_pvn.insert("", tk.END, values=(
+                row.pvn or "-", row.products, f"{row.gross:,.2f}", f"{row.net:,.2f}", f"{row.vat:,.2f}"))
+        self.report_totals.config(text=f"Stock value {reports.total_value:,.2f}, "
+                                       f"of which VAT {reports.total_vat:,.2f}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import threading
+from typing import Iterable, List, Optional
+
+from database import Database
+from ean13 import _ean13_check_digit, make_random_ean13
+
+# Random generation gives up after this many collisions in a row
+MAX_RANDOM_ATTEMPTS = 1000
+
+def _key(code: str):
+    # 13-digit codes are kept as ints (about half the memory of str);
+    # anything else stays a str, which can never equal an int key
+    return int(code) if len(code) == 13 and code.isdigit() else code
+
+class BarcodeIndex:
+    """In-memory set of every barcode in the barcode table.
+
+    Loaded from the database on first use and updated by TaskRepository as it
+    writes, so collisions are found before SQLite's UNIQUE constraint aborts a
+    transaction. After a failed write call invalidate(); the next use reloads.
+
+    New codes are random EAN-13s, or with a GS1 company prefix the next free
+    item reference in the prefix's range.
+    """
+
+    def __init__(self, db: Database, gs1_prefix: str = ""):
+        if gs1_prefix and (not gs1_prefix.isdigit() or not 6 <= len(gs1_prefix) <= 11):
+            raise ValueError("GS1 prefix must be 6-11 digits")
+        self.db = db
+        self.gs1_prefix = gs1_prefix
+        self._codes: Optional[set] = None
+        self._next_ref = 0
+        self._lock = threading.RLock()
+
+    def _load(self) -> set:
+        if self._codes is None:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT barcode FROM barcode WHERE barcode IS NOT NULL")
+                self._codes = {_key(code) for code, in cursor}
+                if self.gs1_prefix:
+                    # Continue after the highest code already issued from the range
+                    cursor.execute("SELECT MAX(barcode) FROM barcode WHERE barcode >= ? AND barcode < ?",
+                                   (self.gs1_prefix, self.gs1_prefix + ":"))
+                    last = cursor.fetchone()[0]
+                    self._next_ref = int(last[len(self.gs1_prefix):12]) + 1 if last and len(last) == 13 else 0
+        return self._codes
+
+    def invalidate(self):
+        with self._lock:
+            self._codes = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def __contains__(self, code: str) -> bool:
+        with self._lock:
+            return _key(code) in self._load()
+
+    def existing(self, codes: Iterable[str]) -> List[str]:
+        """The given codes that are already taken."""
+        with self._lock:
+            taken = self._load()
+            return [code for code in codes if _key(code) in taken]
+
+    def add(self, codes: Iterable[str]):
+        with self._lock:
+            self._load().update(_key(code) for code in codes)
+
+    def discard(self, codes: Iterable[str]):
+        with self._lock:
+            taken = self._load()
+            for code in codes:
+                taken.discard(_key(code))
+
+    def allocate(self) -> str:
+        """A barcode not yet in use; it is added to the index straight away."""
+        with self._lock:
+            taken = self._load()
+            code = self._next_in_range(taken) if self.gs1_prefix else self._random(taken)
+            taken.add(_key(code))
+            return code
+
+    @staticmethod
+    def _random(taken: set) -> str:
+        for _ in range(MAX_RANDOM_ATTEMPTS):
+            code = make_random_ean13()
+            if int(code) not in taken:
+                return code
+        raise RuntimeError("Could not generate an unused barcode")
+
+    def _next_in_range(self, taken: set) -> str:
+        width = 12 - len(self.gs1_prefix)
+        size = 10 ** width
+        # Wraps around once to reuse references freed by deletes
+        for _ in range(size):
+            ref = self._next_ref % size
+            self._next_ref = ref + 1
+            base = f"{self.gs1_prefix}{ref:0{width}d}"
+            code = base + _ean13_check_digit(base)
+            if int(code) not in taken:
+                return code
+        raise RuntimeError(f"No unused barcodes left for GS1 prefix {self.gs1_prefix}")
@@ -0,0 +1,228 @@
+"""Sharded CHD 3050U PLU export for several scale/till devices.
+
+The catalog is split by category, or by a device mapping that assigns
+categories to each CHD 3050U unit. Shards are formatted and written in a
+process pool; each worker reads through its own read-only SQLite connection,
+so the export never blocks the app's writes. A manifest lists the shards.
+
+    python App/chd_export.py [--by category|device] [--devices CSV/chd3050u_devices.json]
+        [--out CSV/chd3050u] [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from database import Database, read_only_uri
+from task_repository import write_chd3050u_csv
+
+CHD3050U_SHARD_DIR = "./CSV/chd3050u"
+# {"device name": ["category name", ...]}; a category may go to several devices
+CHD3050U_DEVICE_MAP_PATH = "./CSV/chd3050u_devices.json"
+MANIFEST_NAME = "manifest.json"
+
+SHARD_EXPORT_SQL = """
+    SELECT t.id, t.FullName, t.barcode, t.price, t.pvn FROM product_view t
+    WHERE t.category_id IN ({}) ORDER BY t.id ASC
+"""
+# Products no category shard picks up: no category, or one since deleted
+UNCATEGORIZED_EXPORT_SQL = """
+    SELECT t.id, t.FullName, t.barcode, t.price, t.pvn FROM product_view t
+    WHERE t.category_id IS NULL OR t.category_id NOT IN (SELECT id FROM categories)
+    ORDER BY t.id ASC
+"""
+UNCATEGORIZED_SHARD = "Uncategorized"
+
+class ExportShard(NamedTuple):
+    name: str
+    path: str
+    category_ids: List[int]
+    uncategorized: bool = False
+
+class ShardResult(NamedTuple):
+    name: str
+    path: str
+    category_ids: List[int]
+    uncategorized: bool
+    records: int
+    size: int
+    sha256: str
+    seconds: float
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower() or "shard"
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_shard(db_path: str, shard: ExportShard) -> ShardResult:
+    """Write one shard; runs in a worker process."""
+    start = time.perf_counter()
+    conn = sqlite3.connect(read_only_uri(db_path), uri=True)
+    try:
+        cursor = conn.cursor()
+        if shard.uncategorized:
+            cursor.execute(UNCATEGORIZED_EXPORT_SQL)
+        else:
+            cursor.execute(SHARD_EXPORT_SQL.format(",".join("?" * len(shard.category_ids))),
+                           shard.category_ids)
+        records = write_chd3050u_csv(cursor, shard.path)
+    finally:
+        conn.close()
+    if not records and os.path.exists(shard.path):
+        # An emptied category must not leave last run's file behind
+        os.remove(shard.path)
+    exists = os.path.exists(shard.path)
+    return ShardResult(shard.name, shard.path, shard.category_ids, shard.uncategorized, records,
+                       os.path.getsize(shard.path) if exists else 0,
+                       _sha256(shard.path) if exists else "",
+                       round(time.perf_counter() - start, 3))
+
+def load_device_map(path: str = CHD3050U_DEVICE_MAP_PATH) -> Dict[str, List[str]]:
+    with open(path, encoding="utf-8") as f:
+        devices = json.load(f)
+    if not isinstance(devices, dict) or not all(isinstance(v, list) for v in devices.values()):
+        raise ValueError(f"{path}: expected {{\"device\": [\"category\", ...]}}")
+    return devices
+
+def category_shards(categories: Sequence, out_dir: str) -> List[ExportShard]:
+    """One shard per category, from (id, name) pairs."""
+    return [
+        ExportShard(name, os.path.join(out_dir, f"chd3050u_plu_{category_id}_{_slug(name)}.csv"),
+                    [category_id])
+        for category_id, name in categories
+    ]
+
+def device_shards(categories: Sequence, devices: Dict[str, List[str]], out_dir: str) -> List[ExportShard]:
+    """One shard per device, from (id, name) pairs and a device map of category names."""
+    ids = {name.lower(): category_id for category_id, name in categories}
+    unknown = sorted({name for names in devices.values() for name in names if name.lower() not in ids})
+    if unknown:
+        raise ValueError(f"Unknown categories in device map: {', '.join(unknown)}")
+    return [
+        ExportShard(device, os.path.join(out_dir, f"chd3050u_plu_{_slug(device)}.csv"),
+                    sorted({ids[name.lower()] for name in names}))
+        for device, names in devices.items() if names
+    ]
+
+def uncategorized_shard(out_dir: str) -> ExportShard:
+    """Products without a known category, which no category or device shard includes."""
+    return ExportShard(UNCATEGORIZED_SHARD, os.path.join(out_dir, "chd3050u_plu_uncategorized.csv"),
+                       [], uncategorized=True)
+
+def export_sharded(db: Database, shards: Sequence[ExportShard], out_dir: str,
+                   workers: Optional[int] = None, progress=None) -> dict:
+    """Write shards in a process pool, then the manifest; returns the manifest.
+
+    progress(done, total, records) is called as shards finish.
+    """
+    paths = [shard.path for shard in shards]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Two shards would write the same file; rename a device")
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    # The largest shards first, so one big category doesn't finish last alone
+    with db.get_connection() as conn:
+        sizes = dict(conn.execute("SELECT category_id, COUNT(*) FROM product_view GROUP BY category_id"))
+    ordered = sorted(shards, key=lambda s: -sum(sizes.get(cid, 0) for cid in s.category_ids))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(ordered) or 1))
+    if workers == 1:
+        # Starting a process costs more than it saves with a single core
+        for shard in ordered:
+            results.append(export_shard(db.db_path, shard))
+            if progress:
+                progress(len(results), len(ordered), sum(r.records for r in results))
+    else:
+        # spawn, not fork: the caller may be the Tk app with its worker threads running
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(export_shard, db.db_path, shard) for shard in ordered]
+            for future in as_completed(futures):
+                results.append(future.result())
+                if progress:
+                    progress(len(results), len(futures), sum(r.records for r in results))
+
+    order = {shard.name: i for i, shard in enumerate(shards)}
+    results.sort(key=lambda r: order[r.name])
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "format": "CHD 3050U PLU",
+        "workers": workers,
+        "seconds": round(time.perf_counter() - start, 3),
+        "records": sum(r.records for r in results),
+        "uncategorized": sum(r.records for r in results if r.uncategorized),
+        "shards": [
+            {
+                "name": r.name,
+                "file": os.path.basename(r.path) if r.records else None,
+                "category_ids": r.category_ids,
+                "uncategorized": r.uncategorized,
+                "records": r.records,
+                "bytes": r.size,
+                "sha256": r.sha256,
+                "seconds": r.seconds,
+            }
+            for r in results
+        ],
+    }
+    fd, tmp_path = tempfile.mkstemp(prefix=".manifest_", suffix=".json", dir=out_dir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return manifest
+
+def export_for_devices(db: Database, out_dir: str = CHD3050U_SHARD_DIR,
+                       device_map_path: Optional[str] = CHD3050U_DEVICE_MAP_PATH,
+                       workers: Optional[int] = None, progress=None) -> dict:
+    """Shard by the device map if it exists, otherwise by category, plus the uncategorized shard."""
+    with db.get_connection() as conn:
+        categories = conn.execute("SELECT id, category_name FROM categories ORDER BY id").fetchall()
+    if device_map_path and os.path.exists(device_map_path):
+        shards = device_shards(categories, load_device_map(device_map_path), out_dir)
+    else:
+        shards = category_shards(categories, out_dir)
+    shards.append(uncategorized_shard(out_dir))
+    return export_sharded(db, shards, out_dir, workers, progress)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="./Database/tasks.db")
+    parser.add_argument("--by", choices=("category", "device"), default="device",
+                        help="device falls back to category when there is no device map")
+    parser.add_argument("--devices", default=CHD3050U_DEVICE_MAP_PATH)
+    parser.add_argument("--out", default=CHD3050U_SHARD_DIR)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        manifest = export_for_devices(db, args.out, args.devices if args.by == "device" else None,
+                                      args.workers)
+    finally:
+        db.close()
+    for shard in manifest["shards"]:
+        print(f"  {shard['name']:<24}{shard['records']:>9} records  {shard['file'] or '-'}")
+    print(f"{manifest['records']} records in {len(manifest['shards'])} shards, "
+          f"{manifest['seconds']:.2f} s with {manifest['workers']} workers")
+    if manifest["uncategorized"]:
+        print(f"{manifest['uncategorized']} products have no known category")
+
+if __name__ == "__main__":
+    main()
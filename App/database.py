@@ -0,0 +1,620 @@
+import sqlite3
+import os
+import threading
+import urllib.parse
+from typing import List
+from contextlib import contextmanager
+
+from query_profiler import ProfiledConnection, QueryProfiler
+
+# Connection tuning applied once per long-lived connection
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",      # ~16 MB page cache
+    "PRAGMA mmap_size = 268435456",    # 256 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+STATEMENT_CACHE_SIZE = 256
+
+# Per-statement timing and the slow-query log; can be toggled at runtime
+# through Database.profiler.enabled
+SQL_PROFILING = False
+
+# One flat row per product for the read paths, maintained by triggers.
+# Picks the task's primary barcode and active price.
+PRODUCT_VIEW_COLUMNS = ("id, FullName, ItemGroup, ItemSuplier, ItemStatus, DateCreated, "
+                        "InStock, barcode, price, pvn, category_id, barcode_type")
+PRODUCT_VIEW_SELECT = """
+    SELECT
+        t.id,
+        t.FullName,
+        t.ItemGroup,
+        t.ItemSuplier,
+        t.ItemStatus,
+        t.DateCreated,
+        t.InStock,
+        COALESCE((SELECT b.barcode FROM barcode b
+                  WHERE b.task_id = t.id AND b.is_primary = 1 ORDER BY b.id LIMIT 1), ''),
+        COALESCE((SELECT p.price FROM price p
+                  WHERE p.task_id = t.id AND p.is_active = 1 ORDER BY p.id LIMIT 1), 0),
+        COALESCE((SELECT pvn.pvn FROM PVN pvn WHERE pvn.id = t.pvn_id), ''),
+        t.category_id,
+        COALESCE((SELECT b.barcode_type FROM barcode b
+                  WHERE b.task_id = t.id AND b.is_primary = 1 ORDER BY b.id LIMIT 1), 0)
+    FROM tasks t
+"""
+
+# Per-row triggers that fire when new tasks and their price, PVN and barcode
+# rows go in; Database.bulk_insert replaces them with set-based statements
+BULK_INSERT_TRIGGERS = (
+    "tasks_fts_insert", "tasks_view_insert", "tasks_log_insert",
+    "price_view_insert", "price_log_insert", "pvn_view_insert",
+    "barcode_view_insert", "barcode_log_insert",
+    "stock_summary_replace", "stock_summary_insert",
+)
+STOCK_SUMMARY_ADD_SQL = """
+    INSERT INTO stock_summary (category_id, pvn, products, units, value_cents)
+    SELECT IFNULL(category_id, 0), IFNULL(pvn, ''), COUNT(*), SUM(IFNULL(InStock, 0)),
+           SUM(CAST(ROUND(IFNULL(InStock, 0) * IFNULL(price, 0) * 100) AS INTEGER))
+    FROM product_view WHERE id > ? GROUP BY 1, 2
+    ON CONFLICT (category_id, pvn) DO UPDATE SET products = products + excluded.products,
+        units = units + excluded.units, value_cents = value_cents + excluded.value_cents
+"""
+
+def read_only_uri(db_path: str) -> str:
+    # urllib.parse, not urllib.request.pathname2url: that import costs ~50 ms
+    path = os.path.abspath(db_path).replace(os.sep, "/")
+    if not path.startswith("/"):
+        path = "/" + path  # Windows drive, file:/C:/...
+    return f"file:{urllib.parse.quote(path, safe='/:')}?mode=ro"
+
+class Database:
+    
+    def __init__(self, db_path: str = './Database/tasks.db'):
+        self.db_path = db_path
+        # One long-lived connection per thread, closed together in close()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.profiler = QueryProfiler(SQL_PROFILING)
+        self._ensure_database_exists()
+        
+    def _ensure_database_exists(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self.get_connection() as conn:
+            self._migrate(conn)
+            self.fts_enabled = self._ensure_fts(conn)
+    
+    def _migrations(self) -> list:
+        # Applied in order; PRAGMA user_version holds how many have run.
+        # Only ever append to this list.
+        return [
+            self._create_tables,
+            self._add_join_indexes,
+            self._add_category_index,
+            self._create_fts,
+            self._create_product_view,
+            self._add_primary_indexes,
+            self._narrow_view_triggers,
+            self._add_view_category_index,
+            self._create_change_log,
+            self._add_sort_indexes,
+            self._create_stock_summary,
+            self._add_nocase_filter_indexes,
+            self._narrow_change_log_triggers,
+        ]
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        migrations = self._migrations()
+        
+        # Schema already current: no DDL at startup
+        for number, migration in enumerate(migrations[version:], start=version + 1):
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    
+    def _ensure_fts(self, conn: sqlite3.Connection) -> bool:
+        """Create tasks_fts if it is missing; False when this SQLite has no FTS5.
+
+        The migration leaves it out on SQLite builds without FTS5 and is
+        recorded as done regardless, so it is checked on every start: a
+        database migrated without FTS5 gets its index once opened by a
+        SQLite that has it.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")
+        if cursor.fetchone():
+            return True
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            created = self._create_fts(cursor)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return created
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE,
+                               check_same_thread=False, factory=ProfiledConnection)
+        conn.profiler = self.profiler
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def get_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            # Don't leave a half-done transaction open on the shared connection
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.depth = depth
+            if depth == 0 and self.profiler.enabled:
+                self.profiler.flush()
+    
+    @contextmanager
+    def bulk_insert(self, cursor: sqlite3.Cursor):
+        """Insert many new tasks without the per-row insert triggers.
+
+        Runs inside the caller's write transaction. The triggers are dropped
+        and, once the block is done, the new tasks' product_view, stock_summary,
+        tasks_fts and change_log rows are added with one statement each and the
+        triggers created again; other connections never see them missing.
+        Only for inserting new tasks with their own price, PVN and barcode rows.
+        """
+        placeholders = ",".join("?" * len(BULK_INSERT_TRIGGERS))
+        cursor.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                       f"AND name IN ({placeholders})", BULK_INSERT_TRIGGERS)
+        triggers = dict(cursor.fetchall())
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
+        last_id = cursor.fetchone()[0]
+        for name in triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+        try:
+            yield
+            cursor.execute(f"INSERT INTO product_view ({PRODUCT_VIEW_COLUMNS}) "
+                           f"{PRODUCT_VIEW_SELECT} WHERE t.id > ?", (last_id,))
+            if "stock_summary_insert" in triggers:
+                cursor.execute(STOCK_SUMMARY_ADD_SQL, (last_id,))
+            if "tasks_fts_insert" in triggers:
+                cursor.execute("INSERT INTO tasks_fts (rowid, FullName, ItemGroup, ItemSuplier) "
+                               "SELECT id, FullName, ItemGroup, ItemSuplier FROM tasks WHERE id > ?",
+                               (last_id,))
+            if "tasks_log_insert" in triggers:
+                cursor.execute("INSERT INTO change_log (task_id) SELECT id FROM tasks WHERE id > ?",
+                               (last_id,))
+        finally:
+            # Also on failure: the transaction may be rolled back, but must
+            # never be committed without them
+            for sql in triggers.values():
+                cursor.execute(sql)
+
+    def check_product_view(self, rebuild: bool = False) -> int:
+        """Number of product_view rows that differ from the source tables.
+
+        With rebuild=True a stale view is rebuilt from scratch.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT
+                    (SELECT COUNT(*) FROM (SELECT {PRODUCT_VIEW_COLUMNS} FROM product_view
+                                           EXCEPT {PRODUCT_VIEW_SELECT})) +
+                    (SELECT COUNT(*) FROM ({PRODUCT_VIEW_SELECT}
+                                           EXCEPT SELECT {PRODUCT_VIEW_COLUMNS} FROM product_view))
+            """)
+            stale = cursor.fetchone()[0]
+            if stale and rebuild:
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    self._fill_product_view(cursor)
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+            return stale
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+    
+    def _create_tables(self, cursor):
+        # Categories table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_name TEXT UNIQUE NOT NULL
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                FullName TEXT NOT NULL,
+                ItemGroup TEXT,
+                ItemSuplier TEXT,
+                ItemStatus TEXT DEFAULT 'pending',
+                DateCreated DATETIME DEFAULT CURRENT_TIMESTAMP,
+                InStock INTEGER,
+                pvn_id INTEGER,
+                category_id INTEGER,
+                FOREIGN KEY(pvn_id) REFERENCES PVN(id),
+                FOREIGN KEY(category_id) REFERENCES categories(id)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS barcode (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER,
+                barcode TEXT UNIQUE,
+                barcode_type INTEGER DEFAULT 0,
+                is_primary INTEGER DEFAULT 1,
+                FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS price (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER,
+                price DECIMAL(10, 2),
+                currency TEXT DEFAULT 'EUR',
+                price_type INTEGER DEFAULT 0,
+                is_active INTEGER DEFAULT 1,
+                FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS PVN (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                price_id INTEGER,
+                pvn TEXT,
+                FOREIGN KEY(price_id) REFERENCES price(id) ON DELETE CASCADE
+            )
+        ''')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_status ON tasks(ItemStatus)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_barcode ON barcode(barcode)')
+    
+    def _add_join_indexes(self, cursor):
+        # Covering indexes for the task list joins and the edit-form lookup
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_barcode_task ON barcode(task_id, barcode, barcode_type)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_price_task ON price(task_id, price)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pvn_price ON PVN(price_id, pvn)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_pvn ON tasks(pvn_id)')
+    
+    def _add_category_index(self, cursor):
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_category ON tasks(category_id)')
+    
+    def _create_fts(self, cursor) -> bool:
+        # Full-text index over the searchable text columns, kept in sync by triggers
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")
+        if cursor.fetchone():
+            return True
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                    FullName, ItemGroup, ItemSuplier,
+                    content='tasks', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: searches fall back to LIKE
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (rowid, FullName, ItemGroup, ItemSuplier)
+                VALUES (new.id, new.FullName, new.ItemGroup, new.ItemSuplier);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, FullName, ItemGroup, ItemSuplier)
+                VALUES ('delete', old.id, old.FullName, old.ItemGroup, old.ItemSuplier);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF FullName, ItemGroup, ItemSuplier ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, FullName, ItemGroup, ItemSuplier)
+                VALUES ('delete', old.id, old.FullName, old.ItemGroup, old.ItemSuplier);
+                INSERT INTO tasks_fts (rowid, FullName, ItemGroup, ItemSuplier)
+                VALUES (new.id, new.FullName, new.ItemGroup, new.ItemSuplier);
+            END
+        ''')
+        # Index the rows that existed before the FTS table
+        cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+        return True
+
+    def _create_product_view(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS product_view (
+                id INTEGER PRIMARY KEY,
+                FullName TEXT,
+                ItemGroup TEXT,
+                ItemSuplier TEXT,
+                ItemStatus TEXT,
+                DateCreated DATETIME,
+                InStock INTEGER,
+                barcode TEXT,
+                price DECIMAL(10, 2),
+                pvn TEXT,
+                category_id INTEGER,
+                barcode_type INTEGER
+            )
+        ''')
+        # Equality filters of the Search frame; rows within a match come in id order
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_status ON product_view(ItemStatus)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_stock ON product_view(InStock)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_date ON product_view(DATE(DateCreated))')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_group ON product_view(ItemGroup)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_barcode ON product_view(barcode)')
+
+        refresh = f"INSERT OR REPLACE INTO product_view ({PRODUCT_VIEW_COLUMNS}) {PRODUCT_VIEW_SELECT}"
+        triggers = {
+            "tasks_view_insert": ("AFTER INSERT ON tasks", f"{refresh} WHERE t.id = new.id;"),
+            "tasks_view_update": ("AFTER UPDATE ON tasks",
+                                  f"DELETE FROM product_view WHERE id = old.id AND old.id <> new.id; "
+                                  f"{refresh} WHERE t.id = new.id;"),
+            "tasks_view_delete": ("AFTER DELETE ON tasks", "DELETE FROM product_view WHERE id = old.id;"),
+        }
+        for table, key in (("barcode", "task_id"), ("price", "task_id")):
+            triggers[f"{table}_view_insert"] = (f"AFTER INSERT ON {table}", f"{refresh} WHERE t.id = new.{key};")
+            triggers[f"{table}_view_update"] = (f"AFTER UPDATE ON {table}",
+                                                f"{refresh} WHERE t.id IN (old.{key}, new.{key});")
+            triggers[f"{table}_view_delete"] = (f"AFTER DELETE ON {table}", f"{refresh} WHERE t.id = old.{key};")
+        triggers["pvn_view_insert"] = ("AFTER INSERT ON PVN", f"{refresh} WHERE t.pvn_id = new.id;")
+        triggers["pvn_view_update"] = ("AFTER UPDATE ON PVN", f"{refresh} WHERE t.pvn_id IN (old.id, new.id);")
+        triggers["pvn_view_delete"] = ("AFTER DELETE ON PVN", f"{refresh} WHERE t.pvn_id = old.id;")
+        for name, (event, body) in triggers.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+        self._fill_product_view(cursor)
+
+    def _add_primary_indexes(self, cursor):
+        # Partial covering indexes: the primary barcode and active price of a
+        # task are found without visiting its other barcode / price rows.
+        # The flag column is repeated so older SQLite versions treat them as covering.
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_barcode_primary
+            ON barcode(task_id, id, barcode, barcode_type, is_primary) WHERE is_primary = 1
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_price_active
+            ON price(task_id, id, price, is_active) WHERE is_active = 1
+        ''')
+
+    def _narrow_view_triggers(self, cursor):
+        # Batch updates and deletes rewrote the whole product_view row, and so
+        # every index on it, once per changed row. These triggers set only the
+        # columns that changed; id / pvn_id changes still refresh the full row.
+        for name in ("tasks_view_update", "barcode_view_insert", "barcode_view_update",
+                     "barcode_view_delete", "price_view_insert", "price_view_update",
+                     "price_view_delete", "pvn_view_insert", "pvn_view_update", "pvn_view_delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+        refresh = f"INSERT OR REPLACE INTO product_view ({PRODUCT_VIEW_COLUMNS}) {PRODUCT_VIEW_SELECT}"
+        set_barcode = """
+            UPDATE product_view SET
+                barcode = COALESCE((SELECT b.barcode FROM barcode b WHERE b.task_id = product_view.id
+                                    AND b.is_primary = 1 ORDER BY b.id LIMIT 1), ''),
+                barcode_type = COALESCE((SELECT b.barcode_type FROM barcode b WHERE b.task_id = product_view.id
+                                         AND b.is_primary = 1 ORDER BY b.id LIMIT 1), 0)
+        """
+        set_price = """
+            UPDATE product_view SET
+                price = COALESCE((SELECT p.price FROM price p WHERE p.task_id = product_view.id
+                                  AND p.is_active = 1 ORDER BY p.id LIMIT 1), 0)
+        """
+        set_pvn = """
+            UPDATE product_view SET
+                pvn = COALESCE((SELECT pvn.pvn FROM PVN pvn
+                                WHERE pvn.id = (SELECT pvn_id FROM tasks WHERE id = product_view.id)), '')
+        """
+        triggers = {
+            "tasks_view_update": ("AFTER UPDATE OF id, pvn_id ON tasks",
+                                  f"DELETE FROM product_view WHERE id = old.id AND old.id <> new.id; "
+                                  f"{refresh} WHERE t.id = new.id;"),
+            "barcode_view_insert": ("AFTER INSERT ON barcode", f"{set_barcode} WHERE id = new.task_id;"),
+            "barcode_view_update": ("AFTER UPDATE OF id, task_id, barcode, barcode_type, is_primary ON barcode",
+                                    f"{set_barcode} WHERE id IN (old.task_id, new.task_id);"),
+            "barcode_view_delete": ("AFTER DELETE ON barcode", f"{set_barcode} WHERE id = old.task_id;"),
+            "price_view_insert": ("AFTER INSERT ON price", f"{set_price} WHERE id = new.task_id;"),
+            "price_view_update": ("AFTER UPDATE OF id, task_id, price, is_active ON price",
+                                  f"{set_price} WHERE id IN (old.task_id, new.task_id);"),
+            "price_view_delete": ("AFTER DELETE ON price", f"{set_price} WHERE id = old.task_id;"),
+            "pvn_view_insert": ("AFTER INSERT ON PVN",
+                                f"{set_pvn} WHERE id IN (SELECT id FROM tasks WHERE pvn_id = new.id);"),
+            "pvn_view_update": ("AFTER UPDATE OF id, pvn ON PVN",
+                                f"{set_pvn} WHERE id IN (SELECT id FROM tasks WHERE pvn_id IN (old.id, new.id));"),
+            "pvn_view_delete": ("AFTER DELETE ON PVN",
+                                f"{set_pvn} WHERE id IN (SELECT id FROM tasks WHERE pvn_id = old.id);"),
+        }
+        # One trigger per plain tasks column, so an update only touches the
+        # product_view indexes on the columns it actually changed
+        for column in ("FullName", "ItemGroup", "ItemSuplier", "ItemStatus", "DateCreated",
+                       "InStock", "category_id"):
+            triggers[f"tasks_view_{column.lower()}"] = (
+                f"AFTER UPDATE OF {column} ON tasks WHEN new.{column} IS NOT old.{column}",
+                f"UPDATE product_view SET {column} = new.{column} WHERE id = new.id;",
+            )
+        for name, (event, body) in triggers.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    def _add_view_category_index(self, cursor):
+        # Sharded CHD export: each shard reads its categories in id order
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_category ON product_view(category_id, id)')
+
+    def _create_change_log(self, cursor):
+        # Ids of products whose PLU line (name, primary barcode, active price,
+        # PVN) changed, in commit order, for delta exports. AUTOINCREMENT keeps
+        # seq increasing after the log is pruned.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL
+            )
+        ''')
+        # Last change_log seq each export target has seen
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS export_state (
+                target TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL,
+                exported_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        log = "INSERT INTO change_log (task_id)"
+        moved = "{log} SELECT old.{key} WHERE old.{key} IS NOT new.{key}; {log} VALUES (new.{key});"
+        triggers = {
+            "tasks_log_insert": ("AFTER INSERT ON tasks", f"{log} VALUES (new.id);"),
+            "tasks_log_update": ("AFTER UPDATE OF id, FullName, pvn_id ON tasks",
+                                 moved.format(log=log, key="id")),
+            "tasks_log_delete": ("AFTER DELETE ON tasks", f"{log} VALUES (old.id);"),
+            "pvn_log_update": ("AFTER UPDATE OF id, pvn ON PVN",
+                               f"{log} SELECT id FROM tasks WHERE pvn_id IN (old.id, new.id);"),
+            "pvn_log_delete": ("AFTER DELETE ON PVN", f"{log} SELECT id FROM tasks WHERE pvn_id = old.id;"),
+        }
+        # Only the primary barcode and active price reach the PLU file; rows
+        # added with a new task are already logged by its tasks insert
+        for table, flag, columns in (("barcode", "is_primary", "barcode, is_primary"),
+                                     ("price", "is_active", "price, is_active")):
+            triggers[f"{table}_log_insert"] = (
+                f"AFTER INSERT ON {table} WHEN new.{flag} = 1 "
+                f"AND EXISTS (SELECT 1 FROM tasks WHERE id = new.task_id)",
+                f"{log} VALUES (new.task_id);",
+            )
+            triggers[f"{table}_log_update"] = (f"AFTER UPDATE OF id, task_id, {columns} ON {table}",
+                                               moved.format(log=log, key="task_id"))
+            triggers[f"{table}_log_delete"] = (f"AFTER DELETE ON {table} WHEN old.{flag} = 1",
+                                               f"{log} VALUES (old.task_id);")
+        for name, (event, body) in triggers.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    def _add_sort_indexes(self, cursor):
+        # Task List column sorting: every column leads an index, and SQLite
+        # appends the rowid (id) to each, so (column, id) keysets are range scans.
+        # ItemGroup, ItemStatus, InStock and barcode already have one.
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_name ON product_view(FullName)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_supplier ON product_view(ItemSuplier)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_created ON product_view(DateCreated)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_price ON product_view(price)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_view_pvn ON product_view(pvn)')
+
+    def _add_nocase_filter_indexes(self, cursor):
+        # Task List column filters match text case-insensitively; a prefix is
+        # a range compared COLLATE NOCASE, which only a NOCASE index serves
+        for column, name in (("FullName", "name"), ("ItemGroup", "group"),
+                             ("ItemSuplier", "supplier"), ("ItemStatus", "status")):
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_view_{name}_nocase '
+                           f'ON product_view({column} COLLATE NOCASE)')
+
+    def _narrow_change_log_triggers(self, cursor):
+        # The edit form writes the name, price and PVN back even when only the
+        # stock changed; log an update only when a PLU field really changed
+        log = "INSERT INTO change_log (task_id)"
+        moved = "{log} SELECT old.{key} WHERE old.{key} IS NOT new.{key}; {log} VALUES (new.{key});"
+        for name, table, key, columns in (
+            ("tasks_log_update", "tasks", "id", ("id", "FullName", "pvn_id")),
+            ("pvn_log_update", "PVN", None, ("id", "pvn")),
+            ("barcode_log_update", "barcode", "task_id", ("id", "task_id", "barcode", "is_primary")),
+            ("price_log_update", "price", "task_id", ("id", "task_id", "price", "is_active")),
+        ):
+            changed = " OR ".join(f"new.{column} IS NOT old.{column}" for column in columns)
+            body = (moved.format(log=log, key=key) if key else
+                    f"{log} SELECT id FROM tasks WHERE pvn_id IN (old.id, new.id);")
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"CREATE TRIGGER {name} AFTER UPDATE OF {', '.join(columns)} ON {table} "
+                           f"WHEN {changed} BEGIN {body} END")
+
+    def _create_stock_summary(self, cursor):
+        # Products, stock units and stock value (InStock * price, in cents so
+        # the running sums stay exact) per category and PVN rate, kept current
+        # by triggers on product_view so reports never scan the catalog
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stock_summary (
+                category_id INTEGER NOT NULL,
+                pvn TEXT NOT NULL,
+                products INTEGER NOT NULL,
+                units INTEGER NOT NULL,
+                value_cents INTEGER NOT NULL,
+                PRIMARY KEY (category_id, pvn)
+            )
+        ''')
+
+        def add(row: str, sign: str) -> str:
+            return (f"INSERT INTO stock_summary (category_id, pvn, products, units, value_cents) "
+                    f"VALUES (IFNULL({row}.category_id, 0), IFNULL({row}.pvn, ''), {sign}1, "
+                    f"{sign}IFNULL({row}.InStock, 0), "
+                    f"{sign}CAST(ROUND(IFNULL({row}.InStock, 0) * IFNULL({row}.price, 0) * 100) AS INTEGER)) "
+                    f"ON CONFLICT (category_id, pvn) DO UPDATE SET products = products + excluded.products, "
+                    f"units = units + excluded.units, value_cents = value_cents + excluded.value_cents;")
+
+        # INSERT OR REPLACE (the full-row refresh) doesn't fire delete
+        # triggers, so a replaced row is taken out before the insert
+        replaced = ("SELECT IFNULL(v.category_id, 0) AS c, v.pvn AS p, IFNULL(v.InStock, 0) AS units, "
+                    "CAST(ROUND(IFNULL(v.InStock, 0) * IFNULL(v.price, 0) * 100) AS INTEGER) AS cents "
+                    "FROM product_view v WHERE v.id = new.id")
+        triggers = {
+            "stock_summary_replace": ("BEFORE INSERT ON product_view", f"""
+                UPDATE stock_summary SET products = products - 1,
+                    units = units - (SELECT units FROM ({replaced})),
+                    value_cents = value_cents - (SELECT cents FROM ({replaced}))
+                WHERE (category_id, pvn) = (SELECT c, IFNULL(p, '') FROM ({replaced}));
+            """),
+            "stock_summary_insert": ("AFTER INSERT ON product_view", add("new", "")),
+            "stock_summary_update": ("AFTER UPDATE OF category_id, pvn, InStock, price ON product_view",
+                                     add("old", "-") + add("new", "")),
+            "stock_summary_delete": ("AFTER DELETE ON product_view", add("old", "-")),
+        }
+        for name, (event, body) in triggers.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+        cursor.execute('''
+            INSERT INTO stock_summary (category_id, pvn, products, units, value_cents)
+            SELECT IFNULL(category_id, 0), IFNULL(pvn, ''), COUNT(*), SUM(IFNULL(InStock, 0)),
+                   SUM(CAST(ROUND(IFNULL(InStock, 0) * IFNULL(price, 0) * 100) AS INTEGER))
+            FROM product_view GROUP BY 1, 2
+        ''')
+
+    def _fill_product_view(self, cursor):
+        cursor.execute("DELETE FROM product_view")
+        cursor.execute(f"INSERT INTO product_view ({PRODUCT_VIEW_COLUMNS}) {PRODUCT_VIEW_SELECT}")
+
+if __name__ == "__main__":
+    # Consistency check for product_view, run from the repository root
+    db = Database()
+    stale = db.check_product_view(rebuild=True)
+    print(f"product_view: {stale} stale rows" + (", rebuilt" if stale else ""))
+    db.close()
@@ -0,0 +1,113 @@
+import random
+
+# NumPy is only imported by the batch helpers, so importing this module stays cheap.
+
+def _ean13_check_digit(twelve_digits: str) -> str:
+    if len(twelve_digits) != 12 or not twelve_digits.isdigit():
+        raise ValueError("EAN-13 requires 12 digits to compute check digit")
+    s_odd = sum(int(d) for d in twelve_digits[::2])
+    s_even = sum(int(d) for d in twelve_digits[1::2])
+    total = s_odd + 3 * s_even
+    return str((10 - (total % 10)) % 10)
+
+def is_valid_ean13(code: str) -> bool:
+    if len(code) != 13 or not code.isdigit():
+        return False
+    return _ean13_check_digit(code[:12]) == code[12]
+
+def make_random_ean13() -> str:
+    base = f"{random.randint(0, 999999999999):012}"
+    return base + _ean13_check_digit(base)
+
+def normalize_barcode_for_export(code: str) -> str:
+    if code is None:
+        return ''
+    s = str(code).strip()
+    if not s:
+        return ''
+    if s.isdigit() and len(s) == 12:
+        return s + _ean13_check_digit(s)
+    return s
+
+# Batch versions: take a list, NumPy array or pandas Series and return NumPy
+# arrays that match the scalar functions element by element.
+
+def _to_str_array(codes):
+    import numpy as np
+    values = codes.to_numpy() if hasattr(codes, "to_numpy") else codes
+    arr = np.asarray(values)
+    if arr.dtype.kind == "U":
+        return arr.reshape(-1)
+    return np.asarray(values, dtype=object).reshape(-1)
+
+def _digit_matrix(arr, width: int):
+    """Digits of each string padded/truncated to width, plus a mask of rows
+    that are exactly width ASCII digits."""
+    import numpy as np
+    fixed = np.ascontiguousarray(arr.astype(f"U{width}"))
+    digits = fixed.view(np.uint32).reshape(len(arr), width).astype(np.int64) - 48
+    ascii_digits = (np.char.str_len(arr) == width) & ((digits >= 0) & (digits <= 9)).all(axis=1)
+    return digits, ascii_digits
+
+def _check_digits_from_matrix(digits):
+    import numpy as np
+    weights = np.tile(np.array([1, 3], dtype=np.int64), 6)
+    total = digits[:, :12] @ weights
+    return (10 - total % 10) % 10
+
+def _non_ascii_digits(arr, width: int, ascii_digits):
+    # str.isdigit() also accepts other Unicode digits; those rare rows go
+    # through the scalar functions so results stay identical
+    import numpy as np
+    candidates = ~ascii_digits & (np.char.str_len(arr) == width) & np.char.isdigit(arr)
+    return np.flatnonzero(candidates)
+
+def ean13_check_digits(codes):
+    """Check digit ('0'-'9') for each 12-digit code; ValueError if any is not 12 digits."""
+    arr = _to_str_array(codes)
+    if arr.dtype.kind != "U":
+        if not all(isinstance(code, str) for code in arr):
+            raise ValueError("EAN-13 requires 12 digits to compute check digit")
+        arr = arr.astype(str)
+    digits, ascii_digits = _digit_matrix(arr, 12)
+    result = _check_digits_from_matrix(digits).astype("U1")
+    fallback = _non_ascii_digits(arr, 12, ascii_digits)
+    if (~ascii_digits).sum() != len(fallback):
+        raise ValueError("EAN-13 requires 12 digits to compute check digit")
+    for i in fallback:
+        result[i] = _ean13_check_digit(arr[i])
+    return result
+
+def is_valid_ean13_batch(codes):
+    """Boolean mask of valid EAN-13 codes; values that are not strings are invalid."""
+    import numpy as np
+    arr = _to_str_array(codes)
+    if arr.dtype.kind != "U":
+        is_str = np.array([isinstance(code, str) for code in arr], dtype=bool)
+        arr = np.where(is_str, arr, "").astype(str)
+    else:
+        is_str = np.ones(len(arr), dtype=bool)
+    digits, ascii_digits = _digit_matrix(arr, 13)
+    valid = ascii_digits & (_check_digits_from_matrix(digits) == digits[:, 12])
+    for i in _non_ascii_digits(arr, 13, ascii_digits):
+        valid[i] = is_valid_ean13(arr[i])
+    return valid & is_str
+
+def normalize_barcodes_for_export(codes):
+    """normalize_barcode_for_export over a column: strip, and complete 12-digit codes."""
+    import numpy as np
+    arr = _to_str_array(codes)
+    if arr.dtype.kind != "U":
+        missing = np.equal(arr, None)
+        arr = arr.astype(str)
+        arr[missing] = ""
+    stripped = np.char.strip(arr)
+    if len(stripped) == 0:
+        return stripped
+    digits, ascii_digits = _digit_matrix(stripped, 12)
+    check = _check_digits_from_matrix(digits).astype("U1")
+    result = stripped.astype(f"U{max(stripped.dtype.itemsize // 4, 13)}")
+    result[ascii_digits] = np.char.add(stripped[ascii_digits], check[ascii_digits])
+    for i in _non_ascii_digits(stripped, 12, ascii_digits):
+        result[i] = normalize_barcode_for_export(stripped[i])
+    return result
@@ -0,0 +1,188 @@
+"""Optional SQL instrumentation for Database connections.
+
+Every connection is a ProfiledConnection. While the QueryProfiler is disabled
+it hands out plain sqlite3 cursors, so the only cost is one Python call per
+cursor() / execute(). When enabled, each statement's time (execute plus
+fetches) and row count are added to the running operation, and statements over
+the slow threshold are written to a rotating log with their query plan.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = "./Database/slow_queries.log"
+SLOW_QUERY_LOG_BYTES = 1_000_000
+SLOW_QUERY_LOG_BACKUPS = 3
+
+class OperationStats:
+    """DB totals for one unit of work, e.g. a worker job."""
+    __slots__ = ("db_ms", "statements", "rows")
+
+    def __init__(self):
+        self.db_ms = 0.0
+        self.statements = 0
+        self.rows = 0
+
+class QueryProfiler:
+
+    def __init__(self, enabled: bool = False, slow_ms: float = SLOW_QUERY_MS,
+                 log_path: str = SLOW_QUERY_LOG):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self._local = threading.local()
+        # logging.Logger, created on the first slow statement
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _pending(self) -> List["ProfiledCursor"]:
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = []
+        return pending
+
+    @contextmanager
+    def operation(self):
+        """Collect the statements run on this thread into one OperationStats."""
+        stats = OperationStats()
+        outer = getattr(self._local, "stats", None)
+        self._local.stats = stats
+        try:
+            yield stats
+        finally:
+            self.flush()
+            self._local.stats = outer
+
+    def flush(self):
+        """Finish the statements this thread's cursors are still fetching from."""
+        pending = getattr(self._local, "pending", None)
+        while pending:
+            pending.pop()._finish()
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed_ms: float, rows: int):
+        stats = getattr(self._local, "stats", None)
+        if stats is not None:
+            stats.db_ms += elapsed_ms
+            stats.statements += 1
+            stats.rows += rows
+        if elapsed_ms >= self.slow_ms:
+            self._log_slow(conn, sql, params, elapsed_ms, rows)
+
+    def _log_slow(self, conn: sqlite3.Connection, sql: str, params, elapsed_ms: float, rows: int):
+        try:
+            # Plain cursor, so the plan lookup itself isn't profiled
+            plan_cursor = sqlite3.Cursor(conn)
+            plan_cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = "\n".join(f"    {row[3]}" for row in plan_cursor.fetchall())
+        except sqlite3.Error as e:
+            plan = f"    (no plan: {e})"
+        text = re.sub(r"\s+", " ", sql).strip()
+        self._get_logger().warning("%.1f ms, %d rows: %s\n    params: %.200r\n%s",
+                                   elapsed_ms, rows, text, params, plan)
+
+    def _get_logger(self):
+        with self._lock:
+            if self._logger is None:
+                # Imported here: logging.handlers pulls in socket and more,
+                # which startup shouldn't pay for while profiling is off
+                import logging
+                import logging.handlers
+
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    self.log_path, maxBytes=SLOW_QUERY_LOG_BYTES,
+                    backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8", delay=True
+                )
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                # Not registered with logging, so each profiler has its own handler
+                logger = logging.Logger("tasks.slow_sql")
+                logger.addHandler(handler)
+                self._logger = logger
+            return self._logger
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Times execute and the fetches that follow it as one statement."""
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self._sql: Optional[str] = None
+
+    def _start(self, sql: str, params):
+        self._finish()
+        self._sql, self._params = sql, params
+        self._elapsed = 0.0
+        self._rows = 0
+        self.connection.profiler._pending().append(self)
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        rows = self._rows if self.description else max(self.rowcount, 0)
+        self.connection.profiler.record(self.connection, sql, self._params, self._elapsed, rows)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += (time.perf_counter() - start) * 1000
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        rows = seq_of_parameters if isinstance(seq_of_parameters, list) else list(seq_of_parameters)
+        self._start(sql, rows[0] if rows else ())
+        return self._timed(super().executemany, sql, rows)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        self._rows += row is not None
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3.Connection whose cursors are profiled while profiler.enabled."""
+
+    profiler: QueryProfiler
+
+    def cursor(self, factory=sqlite3.Cursor):
+        if self.profiler.enabled and factory is sqlite3.Cursor:
+            return super().cursor(ProfiledCursor)
+        return super().cursor(factory)
+
+    # Connection.execute* don't go through cursor(), so route them here
+    def execute(self, sql, parameters=()):
+        if self.profiler.enabled:
+            return self.cursor().execute(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if self.profiler.enabled:
+            return self.cursor().executemany(sql, seq_of_parameters)
+        return super().executemany(sql, seq_of_parameters)
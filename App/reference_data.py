@@ -0,0 +1,72 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from database import Database
+
+class Categories(NamedTuple):
+    """One loaded copy of the categories table; replaced whole, never modified."""
+    items: List[Tuple[int, str]]     # (id, name) sorted by name, as shown in the form
+    names: Dict[int, str]            # id -> name
+    ids: Dict[str, int]              # lower-cased name -> id
+    positions: Dict[int, int]        # id -> index in items
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, str]]) -> "Categories":
+        items = sorted(rows, key=lambda row: row[1])
+        return cls(
+            items=items,
+            names={cid: name for cid, name in items},
+            ids={name.lower(): cid for cid, name in items},
+            positions={cid: i for i, (cid, _) in enumerate(items)},
+        )
+
+class ReferenceData:
+    """Categories and PVN rates kept in memory with dict lookups.
+
+    Categories come from the database; the app reloads them when
+    TaskRepository.sync_external_changes() sees another connection or process
+    (e.g. populate_categories.py) commit. PVN rates come from CSV/PVN.csv.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.categories = Categories.from_rows([])
+        self.pvn_values: List[str] = []
+        self._pvn_set = frozenset()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> Categories:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, category_name FROM categories")
+            categories = Categories.from_rows(cursor.fetchall())
+        with self._lock:
+            self.categories = categories
+            self._loaded = True
+        return categories
+
+    def _current(self) -> Categories:
+        if not self._loaded:
+            return self.load()
+        return self.categories
+
+    def category_name(self, category_id: int) -> Optional[str]:
+        name = self._current().names.get(category_id)
+        if name is None:
+            # Possibly added by another process since the last reload
+            name = self.load().names.get(category_id)
+        return name
+
+    def category_id(self, name: str) -> Optional[int]:
+        category_id = self._current().ids.get(name.lower())
+        if category_id is None:
+            category_id = self.load().ids.get(name.lower())
+        return category_id
+
+    def set_pvn_values(self, values: Sequence[str]):
+        self.pvn_values = list(values)
+        self._pvn_set = frozenset(self.pvn_values)
+
+    def is_valid_pvn(self, value: str) -> bool:
+        return value in self._pvn_set
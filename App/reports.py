@@ -0,0 +1,117 @@
+"""Stock valuation per category and the VAT (PVN) breakdown of the stock value.
+
+Both reports read stock_summary, a few hundred rows kept current by triggers
+on product_view, so they cost the same on 1K or 1M products. ReportCache keeps
+the last result and only reads again once PRAGMA data_version has moved.
+"""
+import sqlite3
+import threading
+from typing import List, NamedTuple, Optional
+
+from database import Database, read_only_uri
+
+CATEGORY_VALUATION_SQL = """
+    SELECT s.category_id, COALESCE(c.category_name, '(none)'),
+           SUM(s.products), SUM(s.units), SUM(s.value_cents)
+    FROM stock_summary s LEFT JOIN categories c ON c.id = s.category_id
+    WHERE s.products <> 0
+    GROUP BY s.category_id ORDER BY SUM(s.value_cents) DESC
+"""
+
+PVN_BREAKDOWN_SQL = """
+    SELECT pvn, SUM(products), SUM(units), SUM(value_cents) FROM stock_summary
+    WHERE products <> 0
+    GROUP BY pvn ORDER BY CAST(REPLACE(pvn, ',', '.') AS REAL) DESC
+"""
+
+class CategoryValuation(NamedTuple):
+    category_id: int
+    category: str
+    products: int
+    units: int
+    value: float
+
+class PvnBreakdown(NamedTuple):
+    pvn: str
+    rate: Optional[float]   # percent; None when the product has no PVN
+    products: int
+    units: int
+    gross: float            # stock value, prices include VAT
+    net: float
+    vat: float
+
+class Reports(NamedTuple):
+    """One loaded copy of both reports; replaced whole, never modified."""
+    categories: List[CategoryValuation]
+    pvn: List[PvnBreakdown]
+
+    @property
+    def total_value(self) -> float:
+        return round(sum(row.value for row in self.categories), 2)
+
+    @property
+    def total_vat(self) -> float:
+        return round(sum(row.vat for row in self.pvn), 2)
+
+def _rate(pvn: str) -> Optional[float]:
+    try:
+        return float(pvn.replace(",", "."))
+    except ValueError:
+        return None
+
+def _pvn_row(pvn: str, products: int, units: int, value_cents: int) -> PvnBreakdown:
+    rate = _rate(pvn)
+    gross = value_cents / 100
+    vat = round(gross * rate / (100 + rate), 2) if rate else 0.0
+    return PvnBreakdown(pvn, rate, products, units, gross, round(gross - vat, 2), vat)
+
+class ReportCache:
+    """Reports cached until another commit to the database.
+
+    Uses its own read-only connection: data_version ignores commits made on
+    the connection that reads it, and the app's writes share the worker's.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reports: Optional[Reports] = None
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(read_only_uri(self.db.db_path), uri=True,
+                                         check_same_thread=False)
+        return self._conn
+
+    def get(self) -> Reports:
+        with self._lock:
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._reports is None or version != self._data_version:
+                # Both reads in one snapshot so the totals agree
+                conn.execute("BEGIN")
+                try:
+                    categories = [CategoryValuation(cid, name, products, units, cents / 100)
+                                  for cid, name, products, units, cents
+                                  in conn.execute(CATEGORY_VALUATION_SQL)]
+                    pvn = [_pvn_row(*row) for row in conn.execute(PVN_BREAKDOWN_SQL)]
+                finally:
+                    conn.rollback()
+                self._reports = Reports(categories, pvn)
+                self._data_version = version
+            return self._reports
+
+    def dataframes(self):
+        """(categories, pvn) as pandas DataFrames for ad-hoc analysis."""
+        import pandas as pd
+        reports = self.get()
+        return (pd.DataFrame(reports.categories, columns=CategoryValuation._fields),
+                pd.DataFrame(reports.pvn, columns=PvnBreakdown._fields))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,173 @@
+"""Compact storage for the Task List rows held on the client.
+
+A RowBlock keeps one page of TaskRows column-wise: numbers in typed arrays,
+the few distinct groups, suppliers, statuses and PVN rates as indexes into a
+shared StringPool, and the per-row strings (name, date, barcode) packed as
+UTF-8 in one bytes object per field. That is ~130 bytes a row against ~640
+for a TaskRow and its twelve objects. Blocks are immutable; changes build a
+new block.
+"""
+import itertools
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from task_repository import TaskRow
+
+# Storage for each TaskRow field: an array typecode, "pool" or "text"
+FIELD_KINDS = {
+    "id": "q",
+    "FullName": "text",
+    "ItemGroup": "pool",
+    "ItemSuplier": "pool",
+    "ItemStatus": "pool",
+    "DateCreated": "text",
+    "InStock": "q",
+    "barcode": "text",
+    "price": "d",
+    "pvn": "pool",
+    "category_id": "q",
+    "barcode_type": "q",
+}
+_KINDS = tuple(FIELD_KINDS[field] for field in TaskRow._fields)
+_POOL_FIELDS = tuple(i for i, kind in enumerate(_KINDS) if kind == "pool")
+_TEXT_FIELDS = tuple(i for i, kind in enumerate(_KINDS) if kind == "text")
+# A "d" column also takes ints (NUMERIC affinity returns whole prices as int)
+_TYPES = {"q": (int,), "d": (float, int), "pool": (str,), "text": (str,)}
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# Largest int a double holds exactly
+FLOAT_INT_MAX = 2 ** 53
+
+def _fits(value, kind: str) -> bool:
+    if value is None:
+        return True
+    if type(value) not in _TYPES[kind]:
+        return False
+    if type(value) is int:
+        return (INT64_MIN <= value <= INT64_MAX if kind == "q"
+                else -FLOAT_INT_MAX <= value <= FLOAT_INT_MAX)
+    return True
+
+def _column_fits(values: Sequence, kind: str) -> bool:
+    expected = _TYPES[kind]
+    if not all(value is None or type(value) in expected for value in values):
+        return False
+    numbers = [value for value in values if type(value) is int]
+    if not numbers:
+        return True
+    low, high = (INT64_MIN, INT64_MAX) if kind == "q" else (-FLOAT_INT_MAX, FLOAT_INT_MAX)
+    return min(numbers) >= low and max(numbers) <= high
+
+class StringPool:
+    """Interned strings shared by the blocks of one list, addressed by index."""
+    __slots__ = ("strings", "_index")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+class RowBlock:
+    """A page of TaskRows stored column-wise; row(i) rebuilds the TaskRow."""
+    __slots__ = ("pool", "ids", "columns", "text", "nulls", "ints", "odd")
+
+    def __init__(self, rows: Sequence[TaskRow], pool: StringPool):
+        self.pool = pool
+        rows = list(rows)
+        values = list(zip(*rows)) if rows else [()] * len(_KINDS)
+
+        # SQLite can hand back any type in any column; rows with a value that
+        # doesn't fit its column are kept whole
+        self.odd: Dict[int, TaskRow] = {}
+        for field, kind in enumerate(_KINDS):
+            if not _column_fits(values[field], kind):
+                self.odd.update((i, rows[i]) for i, value in enumerate(values[field])
+                                if not _fits(value, kind))
+        if self.odd:
+            for i in self.odd:
+                rows[i] = (rows[i][0],) + (None,) * (len(_KINDS) - 1)
+            values = list(zip(*rows))
+
+        self.nulls = array("H", bytes(2 * len(rows)))
+        # Fields of a "d" column that held an int, so row() gives the int back
+        self.ints = array("H", bytes(2 * len(rows)))
+        # Per field: a typed array, pool indexes, or (text fields) the end
+        # offset of each row's UTF-8 in text[field]
+        self.columns: List[array] = []
+        self.text: Dict[int, bytes] = {}
+        add = pool.add
+        for field, kind in enumerate(_KINDS):
+            column = values[field]
+            if None in column:
+                for i, value in enumerate(column):
+                    if value is None:
+                        self.nulls[i] |= 1 << field
+                column = [("" if kind in ("pool", "text") else 0) if value is None else value
+                          for value in column]
+            if kind == "text":
+                encoded = [value.encode("utf-8", "surrogatepass") for value in column]
+                self.text[field] = b"".join(encoded)
+                self.columns.append(array("I", itertools.accumulate(map(len, encoded))))
+            elif kind == "pool":
+                self.columns.append(array("I", [add(value) for value in column]))
+            else:
+                if kind == "d":
+                    for i, value in enumerate(column):
+                        if type(value) is int and not self.nulls[i] >> field & 1:
+                            self.ints[i] |= 1 << field
+                self.columns.append(array(kind, column))
+        self.ids = self.columns[0]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[TaskRow]:
+        return (self.row(i) for i in range(len(self.ids)))
+
+    def row(self, i: int) -> TaskRow:
+        if i < 0:
+            i += len(self.ids)
+        if i in self.odd:
+            return self.odd[i]
+        values = [column[i] for column in self.columns]
+        strings = self.pool.strings
+        for field in _POOL_FIELDS:
+            values[field] = strings[values[field]]
+        for field in _TEXT_FIELDS:
+            ends = self.columns[field]
+            values[field] = self.text[field][ends[i - 1] if i else 0:ends[i]].decode("utf-8", "surrogatepass")
+        whole = self.ints[i]
+        if whole:
+            for field in range(len(_KINDS)):
+                if whole >> field & 1:
+                    values[field] = int(values[field])
+        mask = self.nulls[i]
+        if mask:
+            for field in range(len(_KINDS)):
+                if mask >> field & 1:
+                    values[field] = None
+        return TaskRow._make(values)
+
+    def index(self, task_id: int) -> Optional[int]:
+        """Position of the task in this block, or None."""
+        try:
+            return self.ids.index(task_id)
+        except (ValueError, OverflowError, TypeError):
+            return None
+
+    def rows(self) -> List[TaskRow]:
+        return list(self)
+
+    def nbytes(self) -> int:
+        """Bytes held by the block's columns (the shared pool excluded)."""
+        return (sum(column.itemsize * len(column) for column in self.columns)
+                + self.nulls.itemsize * len(self.nulls) + self.ints.itemsize * len(self.ints)
+                + sum(map(len, self.text.values())))
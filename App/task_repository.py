@@ -0,0 +1,965 @@
+"""Data access for the task catalog, independent of the Tk GUI.
+
+TaskRepository wraps a Database with batch-first read and write methods;
+TaskQuery / FullTextTaskQuery are the keyset-paginated result sets behind the
+Task List. Everything here can be used from scripts, benchmarks and nightly
+jobs without starting Tk.
+"""
+import csv
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from barcode_index import BarcodeIndex
+from database import Database
+from ean13 import is_valid_ean13_batch, normalize_barcodes_for_export
+from reference_data import ReferenceData
+
+# Full-text matches up to this count are ordered by relevance, larger ones by id
+FTS_RANK_LIMIT = 2000
+
+# CHD 3050U PLU export
+CHD3050U_CSV_PATH = "./CSV/chd3050u_plu.csv"
+CHD3050U_DELTA_CSV_PATH = "./CSV/chd3050u_plu_delta.csv"
+# export_state row holding the change_log watermark of the PLU files
+CHD3050U_EXPORT_TARGET = "chd3050u"
+EXPORT_CHUNK_SIZE = 5000
+
+# Bulk CSV import
+IMPORT_CHUNK_SIZE = 5000
+
+# Store's GS1 company prefix; when set, new barcodes are numbered sequentially
+# from its range instead of generated at random
+GS1_COMPANY_PREFIX = ""
+
+# Recent barcode lookups kept by TaskRepository.find_by_barcode
+BARCODE_CACHE_SIZE = 256
+
+# SQLite's default limit on bound parameters is well above this
+MAX_IN_PARAMS = 500
+
+class TaskRow(NamedTuple):
+    """One Task List row, in Treeview column order, then the edit form's extra fields."""
+    id: int
+    FullName: str
+    ItemGroup: str
+    ItemSuplier: str
+    ItemStatus: str
+    DateCreated: str
+    InStock: int
+    barcode: str
+    price: float
+    pvn: str
+    category_id: Optional[int]
+    barcode_type: int
+
+# The Task List's columns; category_id and barcode_type only fill the edit form
+LIST_COLUMNS = TaskRow._fields[:10]
+# Task List columns that can be sorted and filtered; each is the first column
+# of a product_view index, see database.py
+SORT_COLUMNS = LIST_COLUMNS
+NUMERIC_COLUMNS = ("id", "InStock", "price")
+# Filtered ignoring (ASCII) case, like the LIKE search modes; the other text
+# columns hold digits only
+CASELESS_COLUMNS = ("FullName", "ItemGroup", "ItemSuplier", "ItemStatus")
+
+class NewTask(NamedTuple):
+    FullName: str
+    category_id: int
+    ItemSuplier: str
+    InStock: int
+    price: float
+    pvn: str
+    barcode: str = ""       # generated when empty
+    barcode_type: int = 0
+
+class DeltaExport(NamedTuple):
+    """Outcome of TaskRepository.export_chd3050u_delta."""
+    changed: int      # U lines: products added or changed
+    deleted: int      # D lines: PLU numbers to remove from the device
+    full: bool        # no earlier export recorded, so every product was written
+    seq: int          # change_log watermark the file is current to
+
+class ImportResult(NamedTuple):
+    """Outcome of TaskRepository.import_csv."""
+    imported: int
+    rejected: int     # rows written to the rejects file, whatever the reason
+    # Category names not in the categories table -> rows naming them; those
+    # rows are among the rejected, never stored without a category
+    unknown_categories: Dict[str, int]
+
+class TaskUpdate(NamedTuple):
+    id: int
+    FullName: str
+    category_id: int
+    ItemSuplier: str
+    InStock: int
+    price: float
+    pvn: str
+    barcode: str = ""       # left unchanged when empty
+    barcode_type: int = 0
+
+def _task_row(cursor, row) -> TaskRow:
+    return TaskRow._make(row)
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+def column_filter(column: str, text: str) -> Tuple[str, tuple]:
+    """SQL condition for a Task List column filter.
+
+    Numeric columns take 5, =5, >5, >=5, <5, <=5 or a range 5-10. Text
+    matches as a prefix, or exactly after a leading =, ignoring case in
+    CASELESS_COLUMNS. Raises ValueError.
+    """
+    if column not in SORT_COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    text = text.strip()
+    name = f"t.{column}"
+    if column in NUMERIC_COLUMNS:
+        number = r"(-?\d+(?:[.,]\d+)?)"
+        match = re.fullmatch(rf"(<=|>=|<|>|=)?\s*{number}", text)
+        if match:
+            return f"{name} {match.group(1) or '='} ?", (_number(match.group(2)),)
+        match = re.fullmatch(rf"{number}\s*-\s*{number}", text)
+        if match:
+            return f"{name} BETWEEN ? AND ?", (_number(match.group(1)), _number(match.group(2)))
+        raise ValueError(f"{column}: expected a number, a comparison like >5 or a range like 5-10")
+    if column in CASELESS_COLUMNS:
+        name += " COLLATE NOCASE"
+    if text.startswith("="):
+        return f"{name} = ?", (text[1:].strip(),)
+    # A prefix as a range, so the column's index is used (the NOCASE one
+    # for CASELESS_COLUMNS)
+    return f"{name} >= ? AND {name} < ?", (text, text + "\U0010ffff")
+
+def _chunks(items: Sequence, size: int = MAX_IN_PARAMS) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _placeholders(count: int) -> str:
+    return ",".join("?" * count)
+
+# Statements reused by the repository; identical text keeps them in the
+# connection's statement cache
+# Reads go through product_view (see database.py), one row per product
+TASK_ROW_COLUMNS = ("t.id, t.FullName, t.ItemGroup, t.ItemSuplier, t.ItemStatus, t.DateCreated, "
+                    "t.InStock, t.barcode, t.price, t.pvn, t.category_id, t.barcode_type")
+EXPORT_SQL = "SELECT t.id, t.FullName, t.barcode, t.price, t.pvn FROM product_view t ORDER BY t.id ASC"
+# Delta export over change_log entries in (watermark, seq]
+DELTA_EXPORT_SQL = """
+    SELECT t.id, t.FullName, t.barcode, t.price, t.pvn FROM product_view t
+    WHERE t.id IN (SELECT task_id FROM change_log WHERE seq > ? AND seq <= ?)
+    ORDER BY t.id ASC
+"""
+DELTA_DELETED_SQL = """
+    SELECT DISTINCT c.task_id FROM change_log c
+    WHERE c.seq > ? AND c.seq <= ? AND NOT EXISTS (SELECT 1 FROM product_view t WHERE t.id = c.task_id)
+    ORDER BY c.task_id
+"""
+INSERT_TASK_SQL = ("INSERT INTO tasks (id, FullName, ItemGroup, ItemSuplier, InStock, pvn_id, category_id) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)")
+INSERT_PRICE_SQL = "INSERT INTO price (id, task_id, price) VALUES (?, ?, ?)"
+INSERT_PVN_SQL = "INSERT INTO PVN (id, price_id, pvn) VALUES (?, ?, ?)"
+INSERT_BARCODE_SQL = "INSERT INTO barcode (task_id, barcode, barcode_type) VALUES (?, ?, ?)"
+UPDATE_TASK_SQL = """
+    UPDATE tasks SET FullName = ?, ItemGroup = ?,
+        ItemSuplier = ?, InStock = ?, category_id = ?
+    WHERE id = ?
+"""
+# The edit form changes the task's primary barcode and active price only
+UPDATE_PRICE_SQL = """
+    UPDATE price SET price = ?
+    WHERE id = (SELECT id FROM price WHERE task_id = ? AND is_active = 1 ORDER BY id LIMIT 1)
+"""
+UPDATE_PVN_SQL = "UPDATE PVN SET pvn = ? WHERE id = (SELECT pvn_id FROM tasks WHERE id = ?)"
+UPDATE_BARCODE_SQL = """
+    UPDATE barcode SET barcode = ?, barcode_type = ?
+    WHERE id = (SELECT id FROM barcode WHERE task_id = ? AND is_primary = 1 ORDER BY id LIMIT 1)
+"""
+INSERT_SECONDARY_BARCODE_SQL = ("INSERT INTO barcode (task_id, barcode, barcode_type, is_primary) "
+                                "VALUES (?, ?, ?, 0)")
+# Point lookup through idx_barcode; matches secondary barcodes too
+BARCODE_FILTER = "t.id = (SELECT task_id FROM barcode WHERE barcode = ?)"
+UPDATE_STATUS_SQL = "UPDATE tasks SET ItemStatus = ? WHERE id = ?"
+# Stock never goes below zero, same as the edit form and CSV import allow
+ADJUST_STOCK_SQL = "UPDATE tasks SET InStock = MAX(InStock + ?, 0) WHERE id = ?"
+# Task before its price so the PVN cascade doesn't orphan tasks.pvn_id
+DELETE_SQL = (
+    "DELETE FROM barcode WHERE task_id = ?",
+    "DELETE FROM tasks WHERE id = ?",
+    "DELETE FROM price WHERE task_id = ?",
+)
+
+class _Descending:
+    """Sort key wrapper that orders in reverse."""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __gt__(self, other):
+        return other.key > self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+class TaskQuery:
+    """Keyset-paginated task list for an optional tasks filter.
+
+    Ordered by sort (a product_view / TaskRow column) then id, descending by
+    default; pages continue from the last row's (sort value, id), so every
+    page is an index range scan however far down the list it is.
+    """
+
+    def __init__(self, db: Database, where: str = "", params: tuple = (),
+                 sort: str = "id", descending: bool = True):
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        self.db = db
+        self.where = where
+        self.params = tuple(params)
+        self.sort = sort
+        self.descending = descending
+        self._sort_index = TaskRow._fields.index(sort)
+
+    def _filter(self, condition: str = "") -> str:
+        clauses = [f"({c})" for c in (self.where, condition) if c]
+        return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def _order(self, reverse: bool = False) -> str:
+        direction = "DESC" if self.descending != reverse else "ASC"
+        if self.sort == "id":
+            return f"t.id {direction}"
+        return f"t.{self.sort} {direction}, t.id {direction}"
+
+    def count(self) -> int:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM product_view t {self._filter()}", self.params)
+            return cursor.fetchone()[0]
+
+    def _page(self, condition: str, params: tuple, limit: int, reverse: bool = False) -> List[TaskRow]:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = _task_row
+            cursor.execute(f"""
+                SELECT {TASK_ROW_COLUMNS} FROM product_view t {self._filter(condition)}
+                ORDER BY {self._order(reverse)} LIMIT ?
+            """, self.params + params + (limit,))
+            return cursor.fetchall()
+
+    def _keyset(self, row: TaskRow, forward: bool) -> List[Tuple[str, tuple]]:
+        """Conditions for the rows after (or before) row, in the order they come.
+
+        NULLs sort first and never satisfy a row value comparison, so they
+        get a range of their own.
+        """
+        op = "<" if forward == self.descending else ">"
+        if self.sort == "id":
+            return [(f"t.id {op} ?", (row[0],))]
+        column = f"t.{self.sort}"
+        value = row[self._sort_index]
+        if value is None:
+            ranges = [(f"{column} IS NULL AND t.id {op} ?", (row[0],))]
+            return ranges + [(f"{column} IS NOT NULL", ())] if op == ">" else ranges
+        ranges = [(f"({column}, t.id) {op} (?, ?)", (value, row[0]))]
+        return ranges + [(f"{column} IS NULL", ())] if op == "<" else ranges
+
+    def _keyset_page(self, row: TaskRow, limit: int, forward: bool) -> List[TaskRow]:
+        rows: List[TaskRow] = []
+        for condition, params in self._keyset(row, forward):
+            rows += self._page(condition, params, limit - len(rows), reverse=not forward)
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def fetch_first(self, limit: int) -> List[TaskRow]:
+        return self._page("", (), limit)
+
+    def fetch_after(self, row: TaskRow, limit: int) -> List[TaskRow]:
+        return self._keyset_page(row, limit, forward=True)
+
+    def fetch_before(self, row: TaskRow, limit: int) -> List[TaskRow]:
+        rows = self._keyset_page(row, limit, forward=False)
+        rows.reverse()
+        return rows
+
+    def fetch_at(self, offset: int, limit: int) -> List[TaskRow]:
+        # Only used for scrollbar jumps; the OFFSET walks the sort index, not whole rows
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT t.id FROM product_view t {self._filter()} "
+                           f"ORDER BY {self._order()} LIMIT 1 OFFSET ?", self.params + (offset,))
+            found = cursor.fetchone()
+        first = self.fetch_row(found[0]) if found else None
+        if first is None:
+            return []
+        return [first] + self.fetch_after(first, limit - 1)
+
+    def fetch_row(self, task_id: int) -> Optional[TaskRow]:
+        """The task's row if it matches this query, else None."""
+        rows = self._page("t.id = ?", (task_id,), 1)
+        return rows[0] if rows else None
+
+    def fetch_rows(self, task_ids: Sequence[int]) -> Dict[int, TaskRow]:
+        """{id: row} of the given tasks that match this query."""
+        rows: Dict[int, TaskRow] = {}
+        for chunk in _chunks(tuple(task_ids)):
+            for row in self._page(f"t.id IN ({_placeholders(len(chunk))})", chunk, len(chunk)):
+                rows[row[0]] = row
+        return rows
+
+    def fetch_ids(self) -> List[int]:
+        """Ids of every task this query matches, e.g. for a batch write on the whole result."""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT t.id FROM product_view t {self._filter()}", self.params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def sort_key(self, row: TaskRow):
+        """Position of a row in this query's order, or None if it can't be placed."""
+        if self.sort == "id":
+            return (-row[0],) if self.descending else (row[0],)
+        value = row[self._sort_index]
+        key = (value is not None, value, row[0])
+        return _Descending(key) if self.descending else key
+
+class FullTextTaskQuery(TaskQuery):
+    """Search through tasks_fts.
+
+    Up to FTS_RANK_LIMIT matches are shown in bm25 rank order. Broader matches
+    are paged by id like the rest of the task list, since ranking them would
+    score every match on each search.
+    """
+
+    def __init__(self, db: Database, match: str):
+        super().__init__(db)
+        self.match = match
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM tasks_fts WHERE tasks_fts MATCH ?", (match,))
+            self.total = cursor.fetchone()[0]
+            self.ranked_ids: Optional[List[int]] = None
+            if self.total <= FTS_RANK_LIMIT:
+                cursor.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ? ORDER BY rank",
+                               (match,))
+                self.ranked_ids = [row[0] for row in cursor.fetchall()]
+                self.positions = {task_id: i for i, task_id in enumerate(self.ranked_ids)}
+
+    @staticmethod
+    def build_match(column: str, term: str) -> Optional[str]:
+        """Every token must match as a prefix within the given column."""
+        tokens = [token.replace('"', '""') for token in term.split()]
+        if not tokens:
+            return None
+        return f"{{{column}}} : (" + " ".join(f'"{token}"*' for token in tokens) + ")"
+
+    def count(self) -> int:
+        return self.total
+
+    def _rows_for_ids(self, ids: List[int]) -> List[TaskRow]:
+        if not ids:
+            return []
+        order = {task_id: i for i, task_id in enumerate(ids)}
+        rows = self._page(f"t.id IN ({','.join('?' * len(ids))})", tuple(ids), len(ids))
+        rows.sort(key=lambda row: order[row[0]])
+        return rows
+
+    def _match_ids(self, condition: str, params: tuple, limit: int, ascending: bool = False,
+                   offset: int = 0) -> List[int]:
+        order = "ASC" if ascending else "DESC"
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT rowid FROM tasks_fts
+                WHERE tasks_fts MATCH ? {f'AND {condition}' if condition else ''}
+                ORDER BY rowid {order} LIMIT ? OFFSET ?
+            """, (self.match,) + params + (limit, offset))
+            return [row[0] for row in cursor.fetchall()]
+
+    def fetch_first(self, limit: int) -> List[TaskRow]:
+        return self.fetch_at(0, limit)
+
+    def fetch_after(self, row: TaskRow, limit: int) -> List[TaskRow]:
+        if self.ranked_ids is not None:
+            start = self.positions[row[0]] + 1
+            return self._rows_for_ids(self.ranked_ids[start:start + limit])
+        return self._rows_for_ids(self._match_ids("rowid < ?", (row[0],), limit))
+
+    def fetch_before(self, row: TaskRow, limit: int) -> List[TaskRow]:
+        if self.ranked_ids is not None:
+            stop = self.positions[row[0]]
+            return self._rows_for_ids(self.ranked_ids[max(0, stop - limit):stop])
+        ids = self._match_ids("rowid > ?", (row[0],), limit, ascending=True)
+        ids.reverse()
+        return self._rows_for_ids(ids)
+
+    def fetch_at(self, offset: int, limit: int) -> List[TaskRow]:
+        if self.ranked_ids is not None:
+            return self._rows_for_ids(self.ranked_ids[offset:offset + limit])
+        return self._rows_for_ids(self._match_ids("", (), limit, offset=offset))
+
+    def fetch_row(self, task_id: int) -> Optional[TaskRow]:
+        if not self._match_ids("rowid = ?", (task_id,), 1):
+            return None
+        return super().fetch_row(task_id)
+
+    def fetch_rows(self, task_ids: Sequence[int]) -> Dict[int, TaskRow]:
+        if not task_ids:
+            return {}
+        # One MATCH over the ids' rowid range; FTS5 doesn't use rowid IN lists
+        matched = set(self._match_ids("rowid BETWEEN ? AND ?", (min(task_ids), max(task_ids)), -1))
+        return super().fetch_rows([task_id for task_id in task_ids if task_id in matched])
+
+    def fetch_ids(self) -> List[int]:
+        if self.ranked_ids is not None:
+            return list(self.ranked_ids)
+        return self._match_ids("", (), -1)
+
+    def sort_key(self, row: TaskRow) -> Optional[tuple]:
+        if self.ranked_ids is None:
+            return super().sort_key(row)
+        # Rows that weren't ranked when the search ran have no place in it
+        position = self.positions.get(row[0])
+        return None if position is None else (position,)
+
+def format_chd3050u_rows(rows: List[Tuple]) -> List[list]:
+    """Format (id, name, barcode, price, pvn) rows as CHD 3050U PLU lines."""
+    barcodes = normalize_barcodes_for_export([row[2] for row in rows])
+    return [
+        [
+            task_id,
+            (name or "").strip()[:25],
+            f"{float(price):.2f}".replace('.', ','),
+            str(pvn).strip(),
+            str(barcode),
+        ]
+        for (task_id, name, _, price, pvn), barcode in zip(rows, barcodes)
+    ]
+
+def write_chd3050u_csv(cursor: sqlite3.Cursor, csv_path: str, progress=None,
+                       deleted: Optional[Sequence[int]] = None) -> int:
+    """Stream (id, name, barcode, price, pvn) rows from cursor into a CHD 3050U PLU file.
+
+    Rows are written EXPORT_CHUNK_SIZE at a time to a temp file that replaces
+    csv_path only once complete. Returns the number of records; when there are
+    none, csv_path is left untouched.
+
+    With deleted (a delta file) an ACTION column is added: U for the rows
+    from cursor, D for the deleted PLU numbers that follow them.
+    """
+    rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+    if not rows and not deleted:
+        return 0
+
+    directory = os.path.dirname(csv_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".chd3050u_", suffix=".csv", dir=directory)
+    count = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            header = ["PLU", "NAME", "PRICE", "VAT", "BARCODE"]
+            writer.writerow(header if deleted is None else header + ["ACTION"])
+            while rows:
+                lines = format_chd3050u_rows(rows)
+                if deleted is not None:
+                    lines = [line + ["U"] for line in lines]
+                writer.writerows(lines)
+                count += len(rows)
+                if progress:
+                    progress(count)
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if deleted:
+                writer.writerows([task_id, "", "", "", "", "D"] for task_id in deleted)
+                count += len(deleted)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _read_import_rows(f):
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(f, dialect)
+    for row in reader:
+        if reader.line_num == 1 and row and row[0].strip().lower() in ("name", "fullname"):
+            continue  # header
+        if any(cell.strip() for cell in row):
+            yield row
+
+def _parse_import_row(row: List[str], categories: Dict[str, int], pvn_values: set) -> NewTask:
+    """Validate one CSV row; raises ValueError with the reject reason."""
+    if len(row) < 6:
+        raise ValueError("expected name, category, supplier, stock, price, PVN[, barcode]")
+    name, category, supplier, stock, price, pvn = (cell.strip() for cell in row[:6])
+    barcode = row[6].strip() if len(row) > 6 else ""
+
+    if not name or len(name) > 25:
+        raise ValueError("FullName must be 1-25 characters")
+    if not category:
+        raise ValueError("ItemGroup is required")
+    if category.lower() not in categories:
+        raise ValueError(f"unknown category '{category}'")
+    if not supplier:
+        raise ValueError("ItemSuplier is required")
+    try:
+        stock = int(stock)
+        price = float(price.replace(",", "."))
+    except ValueError:
+        raise ValueError("InStock and Price must be numeric")
+    if stock < 0 or price < 0:
+        raise ValueError("InStock and Price must not be negative")
+    if pvn not in pvn_values:
+        raise ValueError(f"invalid PVN '{pvn}'")
+
+    return NewTask(name, categories[category.lower()], supplier, stock, price, pvn, barcode)
+
+class TaskRepository:
+    """Batch-first access to tasks and their barcode, price and PVN rows.
+
+    Every write method takes a batch and runs it as one transaction on the
+    calling thread's connection.
+    """
+
+    # Search modes answered from the tasks_fts full-text index
+    FTS_QUERIES = ("by FullName", "by ItemGroup", "by ItemSuplier")
+    SEARCH_MODES = ("by id", "by Barcode", "by FullName", "by ItemGroup", "by ItemSuplier",
+                    "by ItemStatus", "by DateCreated", "by InStock", "All")
+
+    def __init__(self, db: Database, gs1_prefix: str = GS1_COMPANY_PREFIX):
+        self.db = db
+        self.barcodes = BarcodeIndex(db, gs1_prefix)
+        self.reference = ReferenceData(db)
+        # barcode -> TaskRow (or None) of recent scans; cleared by every write.
+        # The generation stops a lookup that raced a write from caching stale rows.
+        self._barcode_cache: "OrderedDict[str, Optional[TaskRow]]" = OrderedDict()
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
+        self._data_version: Optional[int] = None
+
+    # Reads
+
+    def list_categories(self) -> List[Tuple[int, str]]:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, category_name FROM categories ORDER BY category_name")
+            return cursor.fetchall()
+
+    def get(self, task_id: int) -> Optional[TaskRow]:
+        return TaskQuery(self.db).fetch_row(task_id)
+
+    def find_by_barcode(self, barcode: str) -> Optional[TaskRow]:
+        """The product with this primary or secondary barcode, from the LRU cache if recent."""
+        with self._cache_lock:
+            if barcode in self._barcode_cache:
+                self._barcode_cache.move_to_end(barcode)
+                return self._barcode_cache[barcode]
+            generation = self._cache_generation
+
+        rows = TaskQuery(self.db)._page(BARCODE_FILTER, (barcode,), 1)
+        row = rows[0] if rows else None
+
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._barcode_cache[barcode] = row
+                if len(self._barcode_cache) > BARCODE_CACHE_SIZE:
+                    self._barcode_cache.popitem(last=False)
+        return row
+
+    def _clear_barcode_cache(self):
+        with self._cache_lock:
+            self._barcode_cache.clear()
+            self._cache_generation += 1
+
+    def sync_external_changes(self) -> bool:
+        """Drop the barcode cache and index if another connection or process committed.
+
+        data_version ignores the polling connection's own commits, so call
+        this from the thread that does the writes (the app's worker); the
+        first call only records the baseline.
+        """
+        with self.db.get_connection() as conn:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = self._data_version is not None and version != self._data_version
+        self._data_version = version
+        if changed:
+            self._clear_barcode_cache()
+            self.barcodes.invalidate()
+        return changed
+
+    def list_secondary_barcodes(self, task_id: int) -> List[Tuple[str, int]]:
+        """(barcode, barcode_type) of the task's non-primary barcodes, e.g. multipacks."""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT barcode, barcode_type FROM barcode "
+                           "WHERE task_id = ? AND is_primary = 0 ORDER BY id", (task_id,))
+            return cursor.fetchall()
+
+    def list_page(self, after_id: Optional[int] = None, limit: int = 200) -> List[TaskRow]:
+        """Tasks by id descending, starting below after_id."""
+        query = TaskQuery(self.db)
+        if after_id is None:
+            return query.fetch_first(limit)
+        return query._page("t.id < ?", (after_id,), limit)
+
+    def search(self, mode: str, term: str, sort: str = "id", descending: bool = True,
+               column_filters: Optional[Dict[str, str]] = None) -> TaskQuery:
+        """Result set for a Search frame mode, in sort order and narrowed by column filters.
+
+        ValueError for an unknown mode or column, or an invalid filter.
+        """
+        filters = {
+            "by id": ("t.id = ?", (term,)),
+            "by Barcode": (BARCODE_FILTER, (term,)),
+            "by FullName": ("t.FullName LIKE ?", (f'%{term}%',)),
+            "by ItemGroup": ("t.ItemGroup LIKE ?", (f'%{term}%',)),
+            "by ItemSuplier": ("t.ItemSuplier LIKE ?", (f'%{term}%',)),
+            "by ItemStatus": ("t.ItemStatus = ?", (term,)),
+            "by DateCreated": ("DATE(t.DateCreated) = ?", (term,)),
+            "by InStock": ("t.InStock = ?", (term,)),
+            "All": ("", ())
+        }
+        if mode not in filters:
+            raise ValueError(f"Unknown search mode: {mode}")
+        conditions = [column_filter(column, text) for column, text in (column_filters or {}).items()
+                      if text.strip()]
+        where, params = filters[mode]
+        if mode in self.FTS_QUERIES and self.db.fts_enabled:
+            match = FullTextTaskQuery.build_match(mode[len("by "):], term)
+            if match and sort == "id" and descending and not conditions:
+                return FullTextTaskQuery(self.db, match)
+            if match:
+                # Sorted or filtered: the matches are just one more condition
+                where, params = "t.id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)", (match,)
+        for condition, values in conditions:
+            where = f"({where}) AND ({condition})" if where else condition
+            params = params + values
+        return TaskQuery(self.db, where, params, sort, descending)
+
+    def search_key(self, mode: str, term: str) -> Tuple[str, str]:
+        """What search(mode, term) depends on: equal keys give the same result set.
+
+        "All" ignores the term, and full-text modes only see its tokens.
+        """
+        if mode == "All":
+            return mode, ""
+        if mode in self.FTS_QUERIES and self.db.fts_enabled:
+            return mode, " ".join(term.split())
+        return mode, term
+
+    # Writes
+
+    def add_many(self, tasks: Sequence[NewTask]) -> List[int]:
+        """Insert tasks with their price, PVN and barcode rows; returns the new ids.
+
+        Raises sqlite3.IntegrityError (nothing inserted) on a duplicate barcode.
+        """
+        with self._write() as cursor:
+            return self._insert_many(cursor, tasks)
+
+    @contextmanager
+    def _write(self):
+        """A write transaction; the barcode index is reloaded if it fails."""
+        self._clear_barcode_cache()
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+                conn.commit()
+            except BaseException:
+                self.barcodes.invalidate()
+                raise
+            finally:
+                self._clear_barcode_cache()
+
+    def _insert_many(self, cursor: sqlite3.Cursor, tasks: Sequence[NewTask]) -> List[int]:
+        # Ids are allocated up front so every table can go in with executemany;
+        # rows reference each other, so foreign keys are checked at commit
+        cursor.execute("PRAGMA defer_foreign_keys = ON")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
+        task_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM price")
+        price_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM PVN")
+        pvn_id = cursor.fetchone()[0]
+
+        duplicates = self.barcodes.existing(task.barcode for task in tasks if task.barcode)
+        supplied = [task.barcode for task in tasks if task.barcode]
+        if duplicates or len(set(supplied)) != len(supplied):
+            raise sqlite3.IntegrityError(f"UNIQUE constraint failed: barcode.barcode "
+                                         f"({', '.join(duplicates) or 'repeated in batch'})")
+        self.barcodes.add(supplied)
+
+        task_rows, price_rows, pvn_rows, barcode_rows = [], [], [], []
+        for task in tasks:
+            task_id += 1
+            price_id += 1
+            pvn_id += 1
+            task_rows.append((task_id, task.FullName, self.reference.category_name(task.category_id),
+                              task.ItemSuplier, task.InStock, pvn_id, task.category_id))
+            price_rows.append((price_id, task_id, task.price))
+            pvn_rows.append((pvn_id, price_id, task.pvn))
+            barcode_rows.append((task_id, task.barcode or self.barcodes.allocate(), task.barcode_type))
+
+        # Tasks last: the product_view row is then built once, by the tasks trigger
+        cursor.executemany(INSERT_PRICE_SQL, price_rows)
+        cursor.executemany(INSERT_PVN_SQL, pvn_rows)
+        cursor.executemany(INSERT_BARCODE_SQL, barcode_rows)
+        cursor.executemany(INSERT_TASK_SQL, task_rows)
+        return [row[0] for row in task_rows]
+
+    def update_many(self, updates: Sequence[TaskUpdate]):
+        """Raises sqlite3.IntegrityError (nothing changed) if a new barcode is taken."""
+        with self._write() as cursor:
+            changed = [u for u in updates if u.barcode]
+            old = self._primary_barcodes(cursor, [u.id for u in changed])
+            new = [u.barcode for u in changed if u.barcode != old.get(u.id)]
+            duplicates = self.barcodes.existing(new)
+            if duplicates or len(set(new)) != len(new):
+                raise sqlite3.IntegrityError(f"UNIQUE constraint failed: barcode.barcode "
+                                             f"({', '.join(duplicates) or 'repeated in batch'})")
+            cursor.executemany(UPDATE_TASK_SQL, [
+                (u.FullName, self.reference.category_name(u.category_id), u.ItemSuplier, u.InStock,
+                 u.category_id, u.id)
+                for u in updates
+            ])
+            cursor.executemany(UPDATE_PRICE_SQL, [(u.price, u.id) for u in updates])
+            cursor.executemany(UPDATE_PVN_SQL, [(u.pvn, u.id) for u in updates])
+            cursor.executemany(UPDATE_BARCODE_SQL, [
+                (u.barcode, u.barcode_type, u.id) for u in changed if u.id in old
+            ])
+            cursor.executemany(INSERT_BARCODE_SQL, [
+                (u.id, u.barcode, u.barcode_type) for u in changed if u.id not in old
+            ])
+            self.barcodes.discard(old.values())
+            self.barcodes.add(u.barcode for u in changed)
+
+    def set_status_many(self, task_ids: Sequence[int], status: str):
+        with self._write() as cursor:
+            cursor.executemany(UPDATE_STATUS_SQL, [(status, task_id) for task_id in task_ids])
+
+    def complete_many(self, task_ids: Sequence[int]):
+        self.set_status_many(task_ids, "completed")
+
+    def adjust_stock_many(self, task_ids: Sequence[int], delta: int):
+        """Add delta (may be negative) to InStock of each task."""
+        with self._write() as cursor:
+            cursor.executemany(ADJUST_STOCK_SQL, [(delta, task_id) for task_id in task_ids])
+
+    def set_price_many(self, task_ids: Sequence[int], price: Optional[float] = None,
+                       pvn: Optional[str] = None):
+        """Set the active price and/or PVN of each task; None leaves it as is."""
+        with self._write() as cursor:
+            if price is not None:
+                cursor.executemany(UPDATE_PRICE_SQL, [(price, task_id) for task_id in task_ids])
+            if pvn is not None:
+                cursor.executemany(UPDATE_PVN_SQL, [(pvn, task_id) for task_id in task_ids])
+
+    def delete_many(self, task_ids: Sequence[int]) -> Dict[int, str]:
+        """Delete tasks and their rows; returns {id: FullName} of the deleted tasks."""
+        with self._write() as cursor:
+            names = {}
+            for chunk in _chunks(list(task_ids)):
+                cursor.execute(f"SELECT id, FullName FROM tasks WHERE id IN ({_placeholders(len(chunk))})",
+                               chunk)
+                names.update(cursor.fetchall())
+            old = self._barcodes_of(cursor, list(task_ids))
+            params = [(task_id,) for task_id in task_ids]
+            for sql in DELETE_SQL:
+                cursor.executemany(sql, params)
+            self.barcodes.discard(code for codes in old.values() for code in codes)
+        return names
+
+    def add_secondary_barcodes(self, task_id: int, barcodes: Sequence[Tuple[str, int]]):
+        """Attach extra (barcode, barcode_type) codes to a task, e.g. for multipacks.
+
+        Raises sqlite3.IntegrityError (nothing added) if a barcode is taken.
+        """
+        codes = [code for code, _ in barcodes]
+        with self._write() as cursor:
+            duplicates = self.barcodes.existing(codes)
+            if duplicates or len(set(codes)) != len(codes):
+                raise sqlite3.IntegrityError(f"UNIQUE constraint failed: barcode.barcode "
+                                             f"({', '.join(duplicates) or 'repeated in batch'})")
+            cursor.executemany(INSERT_SECONDARY_BARCODE_SQL,
+                               [(task_id, code, barcode_type) for code, barcode_type in barcodes])
+            self.barcodes.add(codes)
+
+    @staticmethod
+    def _primary_barcodes(cursor: sqlite3.Cursor, task_ids: Sequence[int]) -> Dict[int, str]:
+        """The primary barcode shown for each task (its first is_primary row)."""
+        barcodes: Dict[int, str] = {}
+        for chunk in _chunks(task_ids):
+            cursor.execute(f"SELECT task_id, barcode FROM barcode WHERE task_id IN ({_placeholders(len(chunk))}) "
+                           f"AND is_primary = 1 ORDER BY task_id, id", chunk)
+            for task_id, code in cursor.fetchall():
+                barcodes.setdefault(task_id, code)
+        return barcodes
+
+    @staticmethod
+    def _barcodes_of(cursor: sqlite3.Cursor, task_ids: Sequence[int]) -> Dict[int, List[str]]:
+        barcodes: Dict[int, List[str]] = {}
+        for chunk in _chunks(task_ids):
+            cursor.execute(f"SELECT task_id, barcode FROM barcode WHERE task_id IN ({_placeholders(len(chunk))})",
+                           chunk)
+            for task_id, code in cursor.fetchall():
+                barcodes.setdefault(task_id, []).append(code)
+        return barcodes
+
+    # Bulk import / export
+
+    def import_csv(self, csv_path: str, pvn_values: Sequence[str],
+                   rejects_path: Optional[str] = None, progress=None) -> ImportResult:
+        """Import products from a supplier CSV in a single transaction.
+
+        Columns: name, category, supplier, stock, price, PVN, barcode (optional,
+        generated when empty). Invalid rows and duplicate barcodes are written with
+        a reason to rejects_path (default <csv_path>_rejects.csv) instead of
+        aborting the import; so are rows whose category doesn't exist, which
+        unknown_categories counts by name. A file of more than one chunk goes
+        in through Database.bulk_insert.
+        """
+        if rejects_path is None:
+            rejects_path = os.path.splitext(csv_path)[0] + "_rejects.csv"
+        allowed_pvn = set(pvn_values)
+        imported = 0
+        rejects = []
+        unknown_categories: Dict[str, int] = Counter()
+
+        with open(csv_path, newline="", encoding="utf-8-sig") as f, self._write() as cursor:
+            # Fresh copy: the import may run long after the last reload
+            categories = self.reference.load().ids
+
+            rows = _read_import_rows(f)
+            chunk = [row for _, row in zip(range(IMPORT_CHUNK_SIZE), rows)]
+            with ExitStack() as stack:
+                if len(chunk) == IMPORT_CHUNK_SIZE:
+                    # More than a chunk: per-row triggers cost more than
+                    # catching up on the new rows in one go at the end
+                    stack.enter_context(self.db.bulk_insert(cursor))
+                while chunk:
+                    parsed = []
+                    for row in chunk:
+                        try:
+                            parsed.append((row, _parse_import_row(row, categories, allowed_pvn)))
+                        except ValueError as e:
+                            rejects.append(row + [str(e)])
+                            category = row[1].strip() if len(row) > 1 else ""
+                            if category and category.lower() not in categories:
+                                unknown_categories[category] += 1
+
+                    # Barcode checks for the whole chunk: EAN-13 validity, then
+                    # barcodes already taken (earlier chunks are in the index too)
+                    valid = is_valid_ean13_batch([task.barcode for _, task in parsed])
+                    checked = []
+                    for (row, task), is_valid in zip(parsed, valid):
+                        if task.barcode and not is_valid:
+                            rejects.append(row + ["Barcode must be a valid EAN-13"])
+                        else:
+                            checked.append((row, task))
+                    parsed = checked
+                    taken = set(self.barcodes.existing(task.barcode for _, task in parsed
+                                                       if task.barcode))
+
+                    tasks = []
+                    for row, task in parsed:
+                        if task.barcode in taken:
+                            rejects.append(row + ["duplicate barcode"])
+                            continue
+                        if task.barcode:
+                            taken.add(task.barcode)
+                        tasks.append(task)
+
+                    # Empty barcodes are allocated by _insert_many
+                    self._insert_many(cursor, tasks)
+                    imported += len(tasks)
+                    if progress:
+                        progress(imported, len(rejects))
+                    chunk = [row for _, row in zip(range(IMPORT_CHUNK_SIZE), rows)]
+
+        if rejects:
+            with open(rejects_path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(["name", "category", "supplier", "stock", "price", "PVN", "barcode", "reason"])
+                writer.writerows(rejects)
+        return ImportResult(imported, len(rejects), dict(unknown_categories))
+
+    def export_chd3050u(self, csv_path: str = CHD3050U_CSV_PATH, progress=None,
+                        target: str = CHD3050U_EXPORT_TARGET) -> int:
+        """Write the CHD 3050U PLU file; returns the record count (0: file untouched).
+
+        The next delta export for target starts from this one.
+        """
+        with self._read_snapshot() as cursor:
+            seq = self._change_log_seq(cursor)
+            cursor.execute(EXPORT_SQL)
+            count = write_chd3050u_csv(cursor, csv_path, progress)
+        if count:
+            self._set_watermark(target, seq)
+        return count
+
+    def export_chd3050u_delta(self, csv_path: str = CHD3050U_DELTA_CSV_PATH, progress=None,
+                              target: str = CHD3050U_EXPORT_TARGET) -> DeltaExport:
+        """Write only the PLUs changed since target's last export, deletions marked D.
+
+        Without an earlier export every product is written as changed. The
+        watermark moves once the file is in place; when nothing changed the
+        file is left untouched.
+        """
+        with self._read_snapshot() as cursor:
+            seq = self._change_log_seq(cursor)
+            cursor.execute("SELECT last_seq FROM export_state WHERE target = ?", (target,))
+            row = cursor.fetchone()
+            if row is None:
+                deleted = []
+                cursor.execute(EXPORT_SQL)
+            else:
+                cursor.execute(DELTA_DELETED_SQL, (row[0], seq))
+                deleted = [task_id for task_id, in cursor.fetchall()]
+                cursor.execute(DELTA_EXPORT_SQL, (row[0], seq))
+            count = write_chd3050u_csv(cursor, csv_path, progress, deleted)
+        self._set_watermark(target, seq)
+        return DeltaExport(count - len(deleted), len(deleted), row is None, seq)
+
+    @contextmanager
+    def _read_snapshot(self):
+        """A read transaction, so several queries see the same commit."""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                yield cursor
+            finally:
+                conn.commit()
+
+    @staticmethod
+    def _change_log_seq(cursor: sqlite3.Cursor) -> int:
+        # sqlite_sequence, not MAX(seq): the log may have been pruned empty
+        cursor.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)")
+        return cursor.fetchone()[0]
+
+    def _set_watermark(self, target: str, seq: int):
+        with self._write() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO export_state (target, last_seq) VALUES (?, ?)",
+                           (target, seq))
+            # Entries every target has exported are no longer needed
+            cursor.execute("DELETE FROM change_log WHERE seq <= (SELECT MIN(last_seq) FROM export_state)")
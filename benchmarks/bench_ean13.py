@@ -0,0 +1,71 @@
+"""Scalar vs NumPy batch EAN-13 helpers.
+
+Run from the repository root:
+    python benchmarks/bench_ean13.py [--size 500000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "App"))
+
+import numpy as np
+
+from ean13 import (
+    _ean13_check_digit, is_valid_ean13, make_random_ean13, normalize_barcode_for_export,
+    ean13_check_digits, is_valid_ean13_batch, normalize_barcodes_for_export
+)
+
+def make_codes(size: int) -> list:
+    """Mostly valid EAN-13s, plus 12-digit codes, bad check digits, junk and blanks."""
+    rng = random.Random(13)
+    codes = []
+    for _ in range(size):
+        kind = rng.random()
+        code = make_random_ean13()
+        if kind < 0.15:
+            code = code[:12]
+        elif kind < 0.20:
+            code = code[:12] + str((int(code[12]) + 1) % 10)
+        elif kind < 0.23:
+            code = f" {code[:6]}X{code[7:]} "
+        elif kind < 0.25:
+            code = ""
+        codes.append(code)
+    return codes
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=500_000)
+    args = parser.parse_args()
+
+    codes = make_codes(args.size)
+    twelve = [code[:12] for code in codes if len(code) >= 12 and code[:12].isdigit()]
+
+    cases = [
+        ("check digits", twelve,
+         lambda c: [_ean13_check_digit(code) for code in c], ean13_check_digits),
+        ("validate", codes,
+         lambda c: [is_valid_ean13(code) for code in c], is_valid_ean13_batch),
+        ("normalize for export", codes,
+         lambda c: [normalize_barcode_for_export(code) for code in c], normalize_barcodes_for_export),
+    ]
+
+    print(f"{'operation':<22}{'rows':>9}{'scalar s':>11}{'batch s':>10}{'speedup':>9}")
+    for name, data, scalar, batch in cases:
+        expected, scalar_time = timed(scalar, data)
+        result, batch_time = timed(batch, np.array(data))
+        if list(result) != expected:
+            raise SystemExit(f"{name}: batch result differs from scalar")
+        print(f"{name:<22}{len(data):>9}{scalar_time:>11.3f}{batch_time:>10.3f}"
+              f"{scalar_time / batch_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
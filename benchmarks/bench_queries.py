@@ -0,0 +1,250 @@
+"""Timings of the database work behind the Task List, search, edit form, add and export.
+
+Each case runs the same TaskRepository calls as the matching TaskApp handler,
+against synthetic catalogs from catalog.py (copied, so the cache stays clean).
+
+    python benchmarks/bench_queries.py [--sizes 10000 100000 1000000] [--repeat 7]
+        [--out report.json] [--compare baseline.json] [--tolerance 1.25]
+
+With --compare, cases whose median is more than --tolerance times the baseline
+median are listed and the exit status is 1.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from catalog import REPO_ROOT, SIZES, build_catalog, load_pvn_values, make_tasks
+
+from chd_export import export_for_devices
+from database import Database
+from reports import ReportCache
+from row_store import RowBlock, StringPool
+from task_repository import TaskRepository, NewTask
+
+# TaskManager.PAGE_SIZE; not imported so the benchmark doesn't need Tk
+PAGE_SIZE = 200
+
+def measure(fn, repeat: int) -> dict:
+    fn()  # warm the page cache and statement cache
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(times[0], 3),
+        "max_ms": round(times[-1], 3),
+        "runs": repeat,
+    }
+
+def load_list(repo: TaskRepository, mode: str, term: str):
+    # TaskApp._load_list
+    source = repo.search(mode, term)
+    return source.count(), source.fetch_first(PAGE_SIZE)
+
+def load_list_sorted(repo: TaskRepository, column: str, column_filters: dict):
+    source = repo.search("All", "", column, False, column_filters)
+    return source.count(), source.fetch_first(PAGE_SIZE)
+
+def search_terms(repo: TaskRepository) -> dict:
+    """A realistic term for each search mode, taken from the catalog."""
+    row = repo.list_page(limit=PAGE_SIZE)[PAGE_SIZE // 2]
+    return {
+        "by id": str(row.id),
+        "by FullName": row.FullName.split()[1],
+        "by ItemGroup": row.ItemGroup,
+        "by ItemSuplier": row.ItemSuplier.split()[0],
+        "by ItemStatus": "completed",
+        "by DateCreated": row.DateCreated[:10],
+        "by InStock": str(row.InStock),
+    }
+
+def write_import_csv(path: str, tasks: list, category_names: dict):
+    """tasks as a supplier CSV; barcodes left empty so every run can import them again."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([task.FullName, category_names[task.category_id], task.ItemSuplier,
+                                 task.InStock, task.price, task.pvn, ""] for task in tasks)
+
+def bench_catalog(db_path: str, repeat: int) -> dict:
+    db = Database(db_path)
+    repo = TaskRepository(db)
+    export_path = os.path.join(os.path.dirname(db_path), "chd3050u_plu.csv")
+    results = {}
+    try:
+        results["load_tasks"] = measure(lambda: load_list(repo, "All", ""), repeat)
+        for mode, term in search_terms(repo).items():
+            results[f"search {mode}"] = measure(lambda: load_list(repo, mode, term), repeat)
+
+        # Column heading sort: first page, a scrollbar jump to the middle, a filter
+        for column in ("price", "InStock", "DateCreated"):
+            results[f"sort by {column}"] = measure(
+                lambda: repo.search("All", "", column, False).fetch_first(PAGE_SIZE), repeat
+            )
+        middle = repo.search("All", "").count() // 2
+        results["sort by price, jump"] = measure(
+            lambda: repo.search("All", "", "price", True).fetch_at(middle, PAGE_SIZE), repeat
+        )
+        results["filter price 10-12"] = measure(
+            lambda: load_list_sorted(repo, "price", {"price": "10-12"}), repeat
+        )
+
+        # The Task List keeps its pages as RowBlocks; selecting a row reads
+        # the edit form's fields from there
+        page = repo.list_page(limit=PAGE_SIZE)
+        results["row block 200"] = measure(lambda: RowBlock(page, StringPool()), repeat)
+        block = RowBlock(page, StringPool())
+        task_id = page[-1].id
+        results["on_item_select"] = measure(lambda: block.row(block.index(task_id)), repeat)
+        results["secondary barcodes"] = measure(lambda: repo.list_secondary_barcodes(task_id), repeat)
+
+        # Scanner fast path, uncached and from the LRU cache
+        scanned = repo.get(task_id).barcode
+        results["scan barcode (cold)"] = measure(
+            lambda: (repo._clear_barcode_cache(), repo.find_by_barcode(scanned)), repeat
+        )
+        results["scan barcode (cached)"] = measure(lambda: repo.find_by_barcode(scanned), repeat)
+
+        # Bulk collision check against the in-memory barcode index
+        codes = [row.barcode for row in repo.list_page(limit=1000)]
+        results["barcode index load"] = measure(
+            lambda: (repo.barcodes.invalidate(), len(repo.barcodes)), max(1, repeat // 3)
+        )
+        results["barcode check 1000"] = measure(lambda: repo.barcodes.existing(codes), repeat)
+
+        category_id = repo.list_categories()[0][0]
+        source = repo.search("All", "")
+        def add_task():
+            # TaskApp.add_task: insert, then fetch the new row for the list
+            new_id, = repo.add_many([NewTask("Benchmark item", category_id, "Bench", 1, 9.99, "21")])
+            source.fetch_row(new_id)
+        results["add_task"] = measure(add_task, repeat)
+
+        # Batch actions on a Task List selection, including the list patch
+        selected = [row.id for row in repo.list_page(limit=1000)]
+        results["batch stock 1000"] = measure(
+            lambda: (repo.adjust_stock_many(selected, 1), source.fetch_rows(selected)), repeat
+        )
+        results["batch price 1000"] = measure(
+            lambda: (repo.set_price_many(selected, 9.99, "21"), source.fetch_rows(selected)), repeat
+        )
+
+        # Reports panel: a fresh cache reads stock_summary, a warm one only
+        # checks data_version
+        reports = ReportCache(db)
+        results["reports (cold)"] = measure(lambda: ReportCache(db).get(), repeat)
+        results["reports (warm)"] = measure(reports.get, repeat)
+        reports.close()
+
+        # One export is enough at the larger sizes
+        results["export_to_chd3050u"] = measure(
+            lambda: repo.export_chd3050u(export_path), max(1, repeat // 3)
+        )
+        # Delta file after 100 price changes; scales with churn, not catalog size
+        delta_path = os.path.join(os.path.dirname(db_path), "chd3050u_plu_delta.csv")
+        results["export delta 100"] = measure(
+            lambda: (repo.set_price_many(selected[:100], 9.99), repo.export_chd3050u_delta(delta_path)),
+            repeat
+        )
+        # Per-category shards, serially and on every core
+        shard_dir = os.path.join(os.path.dirname(db_path), "shards")
+        for workers in sorted({1, os.cpu_count() or 1}):
+            results[f"export shards x{workers}"] = measure(
+                lambda: export_for_devices(db, shard_dir, None, workers), max(1, repeat // 3)
+            )
+        # Supplier CSV import, last as it grows the catalog: one chunk goes
+        # through the per-row triggers, more than one through Database.bulk_insert
+        names = dict(repo.list_categories())
+        for rows in (1000, 20000):
+            import_path = os.path.join(os.path.dirname(db_path), f"import_{rows}.csv")
+            write_import_csv(import_path, make_tasks(rows, {name: cid for cid, name in names.items()},
+                                                     random.Random(rows)), names)
+            results[f"import csv {rows}"] = measure(
+                lambda: repo.import_csv(import_path, load_pvn_values()), max(1, repeat // 3)
+            )
+    finally:
+        db.close()
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for size, cases in report["results"].items():
+        for name, timing in cases.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not old:
+                continue
+            ratio = timing["median_ms"] / max(old["median_ms"], 0.001)
+            flag = "  REGRESSION" if ratio > tolerance else ""
+            print(f"{size:>9} {name:<24}{old['median_ms']:>11.2f}{timing['median_ms']:>11.2f}"
+                  f"{ratio:>8.2f}x{flag}")
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--out", default="bench_queries.json", help="JSON report path")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="allowed median slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    for size in args.sizes:
+        catalog = build_catalog(size, args.seed)
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, "tasks.db")
+            shutil.copyfile(catalog, db_path)
+            results = bench_catalog(db_path, args.repeat)
+        report["results"][str(size)] = results
+        print(f"\n{size} products")
+        for name, timing in results.items():
+            print(f"  {name:<24}{timing['median_ms']:>10.2f} ms  (min {timing['min_ms']:.2f})")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n{'size':>9} {'case':<24}{'base ms':>11}{'now ms':>11}{'ratio':>9}")
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
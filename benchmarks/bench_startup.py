@@ -0,0 +1,135 @@
+"""Startup time: importing the app's modules, then process launch until the
+first load_tasks has filled the Task List.
+
+Each run is a fresh interpreter. The import timing needs no display, so it
+runs anywhere (CI included). The full startup runs the app against a copy of
+Database/ and CSV/, so the real tasks.db is untouched; it needs a display and
+is skipped without one (use xvfb-run to include it on headless machines).
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 300] [--max-ms 1500]
+        [--imports-only]
+
+Exits with status 1 when a median exceeds its limit.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+APP_DIR = os.path.join(REPO_ROOT, "App")
+
+IMPORT_CHILD = """
+import sys, time
+sys.path.insert(0, {app_dir!r})
+start = time.perf_counter()
+import TaskManager
+print("IMPORTED", (time.perf_counter() - start) * 1000, flush=True)
+"""
+
+STARTUP_CHILD = """
+import sys
+sys.path.insert(0, {app_dir!r})
+import tkinter as tk
+import TaskManager
+
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    print("NO DISPLAY", e, flush=True)
+    sys.exit()
+root.withdraw()
+app = TaskManager.TaskApp(root)
+
+def loaded(event):
+    print("LOADED", flush=True)
+    app.on_close()
+
+root.bind("<<TaskListLoaded>>", loaded)
+root.mainloop()
+"""
+
+class NoDisplay(Exception):
+    pass
+
+def has_display() -> bool:
+    # X11 platforms need DISPLAY; Windows and macOS always have a screen
+    if os.name == "posix" and sys.platform != "darwin":
+        return bool(os.environ.get("DISPLAY"))
+    return True
+
+def import_once() -> float:
+    """Milliseconds to import TaskManager and everything it imports at load."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHILD.format(app_dir=APP_DIR)],
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=60
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith("IMPORTED")]
+    if not lines:
+        raise SystemExit(f"Importing the app failed:\n{result.stderr}")
+    return float(lines[-1].split()[1])
+
+def run_once(workdir: str) -> float:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_CHILD.format(app_dir=APP_DIR)],
+        cwd=workdir, capture_output=True, text=True, timeout=60
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if "NO DISPLAY" in result.stdout:
+        raise NoDisplay(result.stdout.split("NO DISPLAY", 1)[1].strip())
+    if "LOADED" not in result.stdout:
+        raise SystemExit(f"App did not finish loading:\n{result.stderr}")
+    return elapsed
+
+def report(label: str, times: list, limit) -> bool:
+    """Print the summary; False when the median is above limit."""
+    median = statistics.median(times)
+    print(f"{label}: median {median:.0f} ms, "
+          f"min {min(times):.0f} ms, max {max(times):.0f} ms over {len(times)} runs")
+    if limit is not None and median > limit:
+        print(f"REGRESSION: median above {limit:.0f} ms")
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="fail when the median import time is above this")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail when the median startup time is above this")
+    parser.add_argument("--imports-only", action="store_true",
+                        help="skip the full startup, which needs a display")
+    args = parser.parse_args()
+
+    # First import fills the bytecode caches; not counted
+    import_once()
+    ok = report("import TaskManager", [import_once() for _ in range(args.runs)], args.max_import_ms)
+
+    if args.imports_only:
+        pass
+    elif not has_display():
+        print("startup to first load_tasks: skipped, no display (DISPLAY is unset; try xvfb-run)")
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in ("Database", "CSV"):
+                shutil.copytree(os.path.join(REPO_ROOT, name), os.path.join(workdir, name))
+            try:
+                # First run applies any pending migrations to the copy; not counted
+                run_once(workdir)
+                times = [run_once(workdir) for _ in range(args.runs)]
+            except NoDisplay as e:
+                print(f"startup to first load_tasks: skipped, {e}")
+            else:
+                ok = report("startup to first load_tasks", times, args.max_ms) and ok
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Synthetic tasks.db catalogs for the benchmarks.
+
+    python benchmarks/catalog.py --size 100000 [--out path/to/tasks.db]
+
+Catalogs are built through TaskRepository, so they have the app's schema,
+indexes and full-text triggers. build_catalog() caches each (size, seed) under
+benchmarks/.cache; generating 1M products takes a couple of minutes.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "App"))
+
+from database import Database
+from ean13 import make_random_ean13
+from task_repository import TaskRepository, NewTask
+
+CACHE_DIR = os.path.join(BENCH_DIR, ".cache")
+SIZES = (10_000, 100_000, 1_000_000)
+INSERT_CHUNK_SIZE = 50_000
+
+# Same categories as the shipped database, with product vocabulary for each
+CATEGORIES = {
+    "Electronics": (["Wireless", "Smart", "Portable", "USB-C", "HD", "Bluetooth"],
+                    ["Headphones", "Charger", "Speaker", "Mouse", "Keyboard", "Cable", "Monitor"]),
+    "Groceries": (["Organic", "Fresh", "Whole", "Low-fat", "Bio", "Spicy"],
+                  ["Milk", "Bread", "Coffee", "Rice", "Cheese", "Apples", "Pasta", "Yogurt"]),
+    "Clothing": (["Cotton", "Wool", "Slim", "Kids", "Winter", "Linen"],
+                 ["T-Shirt", "Jacket", "Socks", "Jeans", "Scarf", "Hoodie", "Dress"]),
+    "Books": (["Illustrated", "Pocket", "Collected", "Annotated", "Hardcover"],
+              ["Novel", "Cookbook", "Atlas", "Guide", "Poems", "Dictionary"]),
+    "Toys": (["Wooden", "Plush", "Electric", "Mini", "Puzzle"],
+             ["Car", "Bear", "Blocks", "Robot", "Doll", "Train", "Kite"]),
+    "Furniture": (["Oak", "Folding", "Corner", "Pine", "Glass"],
+                  ["Table", "Chair", "Shelf", "Desk", "Wardrobe", "Stool"]),
+    "Sports": (["Pro", "Training", "Outdoor", "Carbon", "Junior"],
+               ["Ball", "Racket", "Helmet", "Gloves", "Bottle", "Mat", "Bike"]),
+    "Beauty": (["Herbal", "Matte", "Vegan", "Hydrating", "Travel"],
+               ["Shampoo", "Lipstick", "Cream", "Soap", "Serum", "Perfume"]),
+    "Home & Garden": (["Ceramic", "Solar", "Steel", "Garden", "Scented"],
+                      ["Pot", "Lamp", "Hose", "Candle", "Rake", "Vase", "Towel"]),
+    "Automotive": (["Premium", "Universal", "Winter", "Heavy-duty", "LED"],
+                   ["Wipers", "Oil", "Bulb", "Mats", "Battery", "Polish"]),
+}
+SUPPLIERS = ["Baltic Trade", "Nordic Supply", "Riga Wholesale", "Amber Goods", "Daugava Import",
+             "Kurzeme Foods", "Vidzeme Retail", "EuroLine", "Latgale Mills", "Metro Partners",
+             "Sigulda Crafts", "Jelgava Distribution"]
+# Most products carry the standard rate
+PVN_WEIGHTS = {"21": 70, "12": 15, "5": 10, "0": 5}
+
+def load_pvn_values() -> list:
+    """First field of each CSV/PVN.csv line, as the app reads it."""
+    with open(os.path.join(REPO_ROOT, "CSV", "PVN.csv"), encoding="utf-8") as f:
+        return [line.split(",")[0].strip() for line in f if line.strip()]
+
+def make_tasks(size: int, category_ids: dict, rng: random.Random) -> list:
+    pvn_values = load_pvn_values()
+    weights = [PVN_WEIGHTS.get(value, 1) for value in pvn_values]
+    names = list(CATEGORIES)
+    barcodes = set()
+    tasks = []
+    for _ in range(size):
+        category = rng.choice(names)
+        adjectives, nouns = CATEGORIES[category]
+        name = f"{rng.choice(adjectives)} {rng.choice(nouns)} {rng.randint(1, 999)}"
+        barcode = make_random_ean13()
+        while barcode in barcodes:
+            barcode = make_random_ean13()
+        barcodes.add(barcode)
+        tasks.append(NewTask(
+            FullName=name[:25],
+            category_id=category_ids[category],
+            ItemSuplier=rng.choice(SUPPLIERS),
+            InStock=rng.randint(0, 500),
+            price=round(rng.lognormvariate(2.0, 1.0), 2),
+            pvn=rng.choices(pvn_values, weights)[0],
+            barcode=barcode,
+        ))
+    return tasks
+
+def generate_catalog(db_path: str, size: int, seed: int = 0):
+    """Create a new tasks.db at db_path with size random products."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(seed)
+    random.seed(seed)  # make_random_ean13 uses the module-level generator
+
+    db = Database(db_path)
+    try:
+        repo = TaskRepository(db)
+        with db.get_connection() as conn:
+            conn.executemany("INSERT INTO categories (category_name) VALUES (?)",
+                             [(name,) for name in CATEGORIES])
+            conn.commit()
+        category_ids = {name: cid for cid, name in repo.list_categories()}
+
+        tasks = make_tasks(size, category_ids, rng)
+        for start in range(0, size, INSERT_CHUNK_SIZE):
+            repo.add_many(tasks[start:start + INSERT_CHUNK_SIZE])
+
+        # Spread creation dates over two years and complete about a fifth
+        with db.get_connection() as conn:
+            conn.execute("UPDATE tasks SET DateCreated = datetime('2024-01-01', "
+                         "'+' || (id * 7919 % 730) || ' days', '+' || (id % 86400) || ' seconds')")
+            conn.execute("UPDATE tasks SET ItemStatus = 'completed' WHERE id % 5 = 0")
+            conn.commit()
+            conn.execute("ANALYZE")
+    finally:
+        db.close()
+
+def build_catalog(size: int, seed: int = 0) -> str:
+    """Path of the cached catalog for (size, seed), generating it if needed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    db_path = os.path.join(CACHE_DIR, f"catalog_{size}_{seed}.db")
+    if not os.path.exists(db_path):
+        tmp_path = db_path + ".tmp"
+        generate_catalog(tmp_path, size, seed)
+        os.replace(tmp_path, db_path)
+    else:
+        # Bring a catalog cached by an older version up to the current schema
+        Database(db_path).close()
+    return db_path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=SIZES[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write here instead of the benchmark cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.out:
+        generate_catalog(args.out, args.size, args.seed)
+        path = args.out
+    else:
+        path = build_catalog(args.size, args.seed)
+    print(f"{path}: {args.size} products in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
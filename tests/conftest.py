@@ -0,0 +1,35 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app's modules import each other as top-level modules, as when run from App/
+sys.path.insert(0, os.path.join(ROOT, "App"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from database import Database
+from task_repository import TaskRepository
+
+CATALOG_SIZE = 1500
+
+@pytest.fixture(scope="session")
+def catalog_path(tmp_path_factory):
+    from catalog import generate_catalog
+    path = str(tmp_path_factory.mktemp("catalog") / "tasks.db")
+    generate_catalog(path, CATALOG_SIZE)
+    return path
+
+@pytest.fixture
+def db(catalog_path, tmp_path):
+    """A fresh copy of the synthetic catalog."""
+    path = str(tmp_path / "tasks.db")
+    shutil.copyfile(catalog_path, path)
+    database = Database(path)
+    yield database
+    database.close()
+
+@pytest.fixture
+def repo(db):
+    return TaskRepository(db)
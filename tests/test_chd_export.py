@@ -0,0 +1,58 @@
+import csv
+import json
+import os
+
+import pytest
+
+from chd_export import MANIFEST_NAME, UNCATEGORIZED_SHARD, export_for_devices
+from task_repository import NewTask
+
+def exported_ids(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return {row[0] for row in csv.reader(f)}
+
+@pytest.fixture
+def uncategorized(repo, db):
+    """One product without a category and one whose category was deleted."""
+    no_category, = repo.add_many([NewTask("Loose item", None, "Bench", 1, 1.5, "21")])
+    orphan, = repo.add_many([NewTask("Orphan item", 1, "Bench", 1, 2.5, "21")])
+    with db.get_connection() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("DELETE FROM categories WHERE id = 1")
+        conn.commit()
+        conn.execute("PRAGMA foreign_keys = ON")
+        products = conn.execute("SELECT COUNT(*) FROM product_view").fetchone()[0]
+        missing = conn.execute("SELECT COUNT(*) FROM product_view WHERE category_id IS NULL "
+                               "OR category_id NOT IN (SELECT id FROM categories)").fetchone()[0]
+    assert missing >= 2
+    return no_category, orphan, products, missing
+
+@pytest.mark.parametrize("by_device", [False, True])
+def test_every_product_lands_in_a_shard(repo, db, tmp_path, uncategorized, by_device):
+    no_category, orphan, products, missing = uncategorized
+    device_map = None
+    if by_device:
+        device_map = str(tmp_path / "devices.json")
+        with db.get_connection() as conn:
+            names = [row[0] for row in conn.execute("SELECT category_name FROM categories")]
+        with open(device_map, "w", encoding="utf-8") as f:
+            json.dump({"Scale 1": names[:3], "Till": names[3:]}, f)
+
+    out_dir = str(tmp_path / "shards")
+    manifest = export_for_devices(db, out_dir, device_map, workers=1)
+
+    assert manifest["records"] == products
+    assert manifest["uncategorized"] == missing
+    shard = next(s for s in manifest["shards"] if s["name"] == UNCATEGORIZED_SHARD)
+    assert shard["uncategorized"] and shard["records"] == manifest["uncategorized"]
+    ids = exported_ids(os.path.join(out_dir, shard["file"]))
+    assert {str(no_category), str(orphan)} <= ids
+    with open(os.path.join(out_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        assert json.load(f)["uncategorized"] == manifest["uncategorized"]
+
+def test_colliding_shard_files_are_rejected(db, tmp_path):
+    device_map = str(tmp_path / "devices.json")
+    with open(device_map, "w", encoding="utf-8") as f:
+        json.dump({"Scale 1": ["Toys"], "scale-1": ["Books"]}, f)
+    with pytest.raises(ValueError):
+        export_for_devices(db, str(tmp_path / "shards"), device_map, workers=1)
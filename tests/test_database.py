@@ -0,0 +1,141 @@
+import csv
+import os
+import shutil
+import sqlite3
+
+import task_repository
+from database import Database
+from task_repository import NewTask, TaskRepository, TaskUpdate
+
+# The database the app shipped with, before any migration (user_version 0)
+BASELINE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "Database", "tasks.db")
+
+SUMMARY_SQL = """
+    SELECT IFNULL(category_id, 0), IFNULL(pvn, ''), COUNT(*), SUM(IFNULL(InStock, 0)),
+           SUM(CAST(ROUND(IFNULL(InStock, 0) * IFNULL(price, 0) * 100) AS INTEGER))
+    FROM product_view GROUP BY 1, 2
+"""
+
+def _summary(db: Database):
+    """(stock_summary as kept by the triggers, the same totals computed afresh)."""
+    with db.get_connection() as conn:
+        kept = conn.execute("SELECT category_id, pvn, products, units, value_cents "
+                            "FROM stock_summary WHERE products <> 0").fetchall()
+        fresh = conn.execute(SUMMARY_SQL).fetchall()
+    return sorted(kept), sorted(fresh)
+
+def test_migrates_baseline_database(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    shutil.copyfile(BASELINE_DB, path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    # A product with no price, PVN, barcode, category or stock, as the old form allowed
+    conn.execute("INSERT INTO tasks (FullName, ItemGroup, ItemSuplier) VALUES ('Loose', NULL, 'Market')")
+    conn.commit()
+    tasks = conn.execute("SELECT id, FullName FROM tasks ORDER BY id DESC").fetchall()
+    conn.close()
+
+    db = Database(path)
+    try:
+        with db.get_connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db._migrations())
+            assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert db.check_product_view() == 0
+        kept, fresh = _summary(db)
+        assert kept == fresh
+        repo = TaskRepository(db)
+        assert [(row.id, row.FullName) for row in repo.list_page()] == tasks
+        assert [row.FullName for row in repo.search("by FullName", "Loose").fetch_first(10)] == ["Loose"]
+    finally:
+        db.close()
+
+    # Opening again runs nothing
+    db = Database(path)
+    try:
+        with db.get_connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db._migrations())
+    finally:
+        db.close()
+
+def test_full_text_index_is_created_when_missing(db):
+    # As left by the migration on a SQLite without FTS5
+    with db.get_connection() as conn:
+        triggers = set(conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'tasks_fts_%' "
+                                    "AND type = 'trigger'"))
+        conn.execute("DROP TABLE tasks_fts")
+        for name, in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.commit()
+        name = conn.execute("SELECT FullName FROM tasks ORDER BY id LIMIT 1").fetchone()[0]
+    db.close()
+
+    reopened = Database(db.db_path)
+    try:
+        assert reopened.fts_enabled
+        with reopened.get_connection() as conn:
+            assert set(conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'tasks_fts_%' "
+                                    "AND type = 'trigger'")) == triggers
+        rows = TaskRepository(reopened).search("by FullName", name).fetch_first(100)
+        assert name in [row.FullName for row in rows]
+    finally:
+        reopened.close()
+
+def test_stock_summary_follows_writes(repo, db):
+    rows = repo.list_page(limit=20)
+    ids = [row.id for row in rows]
+    category_id = repo.list_categories()[0][0]
+
+    repo.adjust_stock_many(ids[:5], 7)
+    repo.set_price_many(ids[5:10], price=3.35)
+    repo.set_price_many(ids[10:12], pvn="0")
+    row = rows[12]
+    repo.update_many([TaskUpdate(row.id, "Renamed", category_id, row.ItemSuplier, row.InStock + 1,
+                                 row.price + 1, row.pvn)])
+    repo.delete_many(ids[13:15])
+    repo.add_many([NewTask("Added", category_id, "Supplier", 4, 2.5, row.pvn)])
+    with db.get_connection() as conn:
+        conn.execute("UPDATE tasks SET InStock = NULL WHERE id = ?", (ids[15],))
+        conn.execute("UPDATE tasks SET category_id = NULL WHERE id = ?", (ids[16],))
+        # A pvn_id change refreshes the whole view row with INSERT OR REPLACE
+        conn.execute("UPDATE tasks SET pvn_id = pvn_id WHERE id IN (?, ?)", (ids[17], ids[18]))
+        conn.commit()
+    kept, fresh = _summary(db)
+    assert kept == fresh
+
+def test_stock_summary_survives_view_rebuild(db):
+    with db.get_connection() as conn:
+        # Knock the view out of step with its source tables, then rebuild it
+        conn.execute("UPDATE product_view SET InStock = InStock + 5, price = price * 2 "
+                     "WHERE id IN (SELECT id FROM product_view LIMIT 10)")
+        conn.commit()
+    # Each stale row counts once per side of the comparison
+    assert db.check_product_view() == 20
+    assert db.check_product_view(rebuild=True) == 20
+    assert db.check_product_view() == 0
+    kept, fresh = _summary(db)
+    assert kept == fresh
+
+def test_bulk_import_keeps_derived_tables(repo, db, tmp_path, monkeypatch):
+    # Several chunks, so the import runs without the per-row triggers
+    monkeypatch.setattr(task_repository, "IMPORT_CHUNK_SIZE", 40)
+    category = repo.list_categories()[0][1]
+    pvn = repo.list_page(limit=1)[0].pvn
+    source = tmp_path / "import.csv"
+    with open(source, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([f"Bulk item {i}", category, "Supplier", i, "1.25", pvn]
+                                for i in range(150))
+    with db.get_connection() as conn:
+        triggers = set(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"))
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    assert repo.import_csv(str(source), [pvn]).imported == 150
+
+    assert db.check_product_view() == 0
+    with db.get_connection() as conn:
+        assert set(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")) == triggers
+        assert conn.execute("SELECT COUNT(*) FROM change_log WHERE seq > ?", (seq,)).fetchone()[0] == 150
+        conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('integrity-check')")
+    assert len(repo.search("by FullName", "Bulk").fetch_first(1000)) == 150
+    kept, fresh = _summary(db)
+    assert kept == fresh
@@ -0,0 +1,199 @@
+import time
+
+import pytest
+
+tk = pytest.importorskip("tkinter")
+from TaskManager import DatabaseWorker, PagedTreeview
+from task_repository import TaskUpdate
+
+class FakeTree:
+    """The Treeview calls PagedTreeview makes, without a display."""
+
+    def __init__(self):
+        self.values = {}
+        self.order = []
+        self.view = (0.0, 1.0)
+
+    def configure(self, **kw):
+        pass
+
+    def tag_configure(self, *args, **kw):
+        pass
+
+    def get_children(self):
+        return list(self.order)
+
+    def insert(self, parent, index, iid, values=(), tags=()):
+        assert iid not in self.values
+        self.values[iid] = values
+        self.order.insert(len(self.order) if index == tk.END else index, iid)
+
+    def item(self, iid, values=None, tags=None):
+        self.values[iid] = values
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.order.remove(iid)
+            del self.values[iid]
+
+    def yview(self, *args):
+        return self.view
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def after_idle(self, callback):
+        pass
+
+class FakeScrollbar:
+    def configure(self, **kw):
+        pass
+
+    def set(self, first, last):
+        pass
+
+class FakeRoot:
+    def after(self, ms, callback):
+        return "after"
+
+    def after_cancel(self, after_id):
+        pass
+
+def loaded(pager):
+    return [row for page in pager.pages for row in page]
+
+def assert_window_matches(pager, source):
+    rows = loaded(pager)
+    assert rows == source.fetch_at(pager.offset, len(rows))
+    assert pager.tree.order == [str(row.id) for row in rows]
+    assert pager.total == source.count()
+
+def scroll_down(pager, pages=1):
+    for _ in range(pages):
+        pager.tree.view = (0.95, 1.0)
+        pager._extend()
+
+@pytest.fixture
+def pager():
+    return PagedTreeview(FakeTree(), FakeScrollbar(), page_size=50, max_pages=3)
+
+@pytest.mark.parametrize("sort, descending", [("id", True), ("price", False), ("InStock", True)])
+def test_scrolling_keeps_the_window_in_order(repo, pager, sort, descending):
+    source = repo.search("All", "", sort, descending)
+    pager.load(source)
+    scroll_down(pager, 5)
+    assert pager.offset > 0
+    assert_window_matches(pager, source)
+    pager._on_scrollbar("moveto", "0.5")
+    assert_window_matches(pager, source)
+
+def test_edit_that_changes_the_sort_value_moves_the_row(repo, pager):
+    source = repo.search("All", "", "price", False)
+    pager.load(source)
+    pager._on_scrollbar("moveto", "0.3")
+    scroll_down(pager)
+    rows = loaded(pager)
+
+    # Out of the window, then within it
+    moved = rows[20]
+    repo.set_price_many([moved.id], 9999.0)
+    pager.patch(moved.id, source.fetch_row(moved.id), moved)
+    assert pager.row(moved.id) is None
+    assert_window_matches(pager, source)
+
+    rows = loaded(pager)
+    moved, target = rows[5], rows[80]
+    repo.set_price_many([moved.id], target.price)
+    pager.patch(moved.id, source.fetch_row(moved.id), moved)
+    assert_window_matches(pager, source)
+
+    scroll_down(pager, 2)
+    assert_window_matches(pager, source)
+
+@pytest.mark.parametrize("sort", ["id", "price"])
+def test_edit_on_a_dropped_page_keeps_the_count(repo, pager, sort):
+    source = repo.search("All", "", sort, False)
+    pager.load(source)
+    first = loaded(pager)[0]
+    scroll_down(pager, 4)
+    assert pager.row(first.id) is None
+    total, offset = pager.total, pager.offset
+
+    repo.update_many([TaskUpdate(first.id, "Renamed", first.category_id, first.ItemSuplier,
+                                 first.InStock + 1, first.price, first.pvn)])
+    pager.patch(first.id, source.fetch_row(first.id), first)
+    assert (pager.total, pager.offset) == (total, offset)
+    assert_window_matches(pager, source)
+
+    # Moved from above the window to below it: one fewer row before the window
+    repo.set_price_many([first.id], 9999.0)
+    pager.patch(first.id, source.fetch_row(first.id), source.fetch_row(first.id)._replace(price=first.price))
+    assert pager.total == total
+    assert_window_matches(pager, source)
+
+def test_batch_edit_moves_rows(repo, pager):
+    source = repo.search("All", "", "InStock", True)
+    pager.load(source)
+    scroll_down(pager)
+    ids = [row.id for row in loaded(pager)[::7]]
+    repo.adjust_stock_many(ids, 25)
+    current = source.fetch_rows(ids)
+    pager.patch_many({task_id: current.get(task_id) for task_id in ids})
+    assert_window_matches(pager, source)
+
+def test_selected_row_comes_from_memory(repo, pager):
+    source = repo.search("All", "")
+    pager.load(source)
+    row = loaded(pager)[3]
+    assert pager.row(row.id) == repo.get(row.id)
+    assert pager.row(-1) is None
+
+@pytest.fixture
+def worker(db):
+    worker = DatabaseWorker(FakeRoot(), db)
+    yield worker
+    worker.stop()
+
+def run_jobs(worker):
+    """Wait for the worker and hand its results to the callbacks, as Tk would."""
+    deadline = time.monotonic() + 10
+    while worker._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+        worker._poll()
+    assert not worker._pending
+
+def test_page_fetches_run_on_the_worker(repo, worker):
+    submitted = []
+
+    def submit(job, on_done, on_error):
+        submitted.append(job)
+        worker.submit(job, on_done, on_error, key="task-list")
+
+    pager = PagedTreeview(FakeTree(), FakeScrollbar(), page_size=50, max_pages=3, submit=submit)
+    source = repo.search("All", "", "price", False)
+    pager.load(source)
+
+    # Two drags in a row: the first is superseded, the window lands on the second
+    pager._on_scrollbar("moveto", "0.2")
+    pager._on_scrollbar("moveto", "0.7")
+    assert len(submitted) == 2 and pager.offset == 0
+    run_jobs(worker)
+    assert pager.offset == int(0.7 * pager.total)
+    assert_window_matches(pager, source)
+
+    # Scrolling while a new result loads fetches nothing
+    pager.loading = True
+    scroll_down(pager)
+    pager._on_scrollbar("moveto", "0.1")
+    assert len(submitted) == 2
+    pager.loading = False
+
+    # One extend at a time; the next waits for the page in flight
+    scroll_down(pager)
+    scroll_down(pager)
+    assert len(submitted) == 3
+    run_jobs(worker)
+    scroll_down(pager)
+    run_jobs(worker)
+    assert len(submitted) == 4
+    assert_window_matches(pager, source)
@@ -0,0 +1,55 @@
+from row_store import RowBlock, StringPool
+from task_repository import TaskRow
+
+def make_row(task_id, **fields):
+    values = dict(FullName=f"Product {task_id}", ItemGroup="Groceries", ItemSuplier="Riga Wholesale",
+                  ItemStatus="pending", DateCreated="2025-01-15 03:46:40", InStock=5,
+                  barcode="0166675189706", price=9.99, pvn="21", category_id=2, barcode_type=0)
+    values.update(fields)
+    return TaskRow(id=task_id, **values)
+
+def test_round_trip():
+    rows = [make_row(i) for i in range(1, 201)]
+    block = RowBlock(rows, StringPool())
+    assert not block.odd
+    assert list(block) == rows
+    assert block.row(-1) == rows[-1]
+    assert block.index(150) == 149
+    assert block.index(999) is None
+
+def test_int_prices_are_stored_column_wise():
+    rows = [make_row(i, price=10) for i in range(1, 201)] + [make_row(201, price=0), make_row(202, price=2.5)]
+    block = RowBlock(rows, StringPool())
+    assert not block.odd
+    assert list(block) == rows
+    assert type(block.row(0).price) is int
+    assert type(block.row(-1).price) is float
+
+def test_nulls_and_text():
+    rows = [
+        make_row(1, FullName=None, ItemSuplier=None, InStock=None, price=None, category_id=None),
+        make_row(2, FullName="Ābols šķiņķis", barcode=""),
+        make_row(3, FullName="a\ud800b"),
+    ]
+    block = RowBlock(rows, StringPool())
+    assert not block.odd
+    assert list(block) == rows
+
+def test_values_that_dont_fit_are_kept_whole():
+    rows = [make_row(1, InStock="5"), make_row(2, InStock=2 ** 70), make_row(3, price=2 ** 60),
+            make_row(4, InStock=True), make_row(5)]
+    block = RowBlock(rows, StringPool())
+    assert set(block.odd) == {0, 1, 2, 3}
+    assert list(block) == rows
+    assert block.index(3) == 2
+
+def test_pool_is_shared():
+    pool = StringPool()
+    RowBlock([make_row(1)], pool)
+    RowBlock([make_row(2)], pool)
+    assert sorted(pool.strings) == ["21", "Groceries", "Riga Wholesale", "pending"]
+
+def test_empty_block():
+    block = RowBlock([], StringPool())
+    assert len(block) == 0
+    assert list(block) == []
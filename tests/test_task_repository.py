@@ -0,0 +1,203 @@
+import csv
+
+import pytest
+
+import task_repository
+from database import Database
+from task_repository import NewTask, TaskQuery, TaskRepository, TaskRow, TaskUpdate, column_filter
+
+def test_barcode_cache_follows_other_connections(repo, db):
+    row = repo.list_page(limit=1)[0]
+    assert repo.sync_external_changes() is False  # baseline
+    assert repo.find_by_barcode(row.barcode).id == row.id
+    assert row.barcode in repo.barcodes
+
+    # Another process re-barcodes the product
+    other = Database(db.db_path)
+    try:
+        TaskRepository(other).update_many([TaskUpdate(row.id, row.FullName, row.category_id,
+                                                      row.ItemSuplier, row.InStock, row.price,
+                                                      row.pvn, "2000000000008", 0)])
+    finally:
+        other.close()
+
+    assert repo.find_by_barcode(row.barcode) is not None  # stale until the check
+    assert repo.sync_external_changes() is True
+    assert repo.find_by_barcode(row.barcode) is None
+    assert repo.find_by_barcode("2000000000008").id == row.id
+    assert row.barcode not in repo.barcodes
+    assert "2000000000008" in repo.barcodes
+
+def test_own_writes_are_not_external(repo):
+    row = repo.list_page(limit=1)[0]
+    repo.sync_external_changes()
+    repo.adjust_stock_many([row.id], 1)
+    assert repo.sync_external_changes() is False
+
+def test_import_rejects_unknown_categories(repo, tmp_path):
+    category = repo.list_categories()[0][1]
+    pvn = repo.list_page(limit=1)[0].pvn
+    source = tmp_path / "import.csv"
+    with open(source, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([
+            ["Known", category.upper(), "Supplier", "3", "1.50", pvn],
+            ["Typo", "No Such Group", "Supplier", "3", "1.50", pvn],
+            ["Typo again", "No Such Group", "Supplier", "1", "2", pvn],
+            ["Blank", "", "Supplier", "1", "2", pvn],
+        ])
+    rejects = tmp_path / "rejects.csv"
+    with repo.db.get_connection() as conn:
+        before = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    result = repo.import_csv(str(source), [pvn], str(rejects))
+
+    assert result == (1, 3, {"No Such Group": 2})
+    with repo.db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == before + 1
+        assert conn.execute("SELECT COUNT(*) FROM tasks WHERE category_id IS NULL").fetchone()[0] == 0
+    with open(rejects, newline="", encoding="utf-8-sig") as f:
+        reasons = [row[-1] for row in csv.reader(f)][1:]
+    assert reasons == ["unknown category 'No Such Group'"] * 2 + ["ItemGroup is required"]
+
+def test_text_filter_ignores_case(repo):
+    name = repo.list_page(limit=1)[0].FullName
+    prefix = name[:3]
+    with repo.db.get_connection() as conn:
+        names = [n for n, in conn.execute("SELECT FullName FROM product_view")]
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM product_view t WHERE "
+                            + column_filter("FullName", prefix)[0], (prefix, prefix)).fetchall()
+    expected = sorted(n for n in names if n.lower().startswith(prefix.lower()))
+
+    for text in (prefix.lower(), prefix.upper()):
+        rows = repo.search("All", "", "id", True, {"FullName": text}).fetch_first(len(names))
+        assert sorted(row.FullName for row in rows) == expected
+    exact = repo.search("All", "", "id", True, {"FullName": "=" + name.swapcase()}).fetch_first(10)
+    assert name in [row.FullName for row in exact]
+    assert "idx_view_name_nocase" in str(plan)
+
+def test_search_key_matches_the_result(repo):
+    words = repo.list_page(limit=1)[0].FullName.split()
+    same = [("All", ""), ("All", words[0]),
+            ("by FullName", words[0]), ("by FullName", f"  {words[0]}  "),
+            ("by FullName", " ".join(words[:2])), ("by FullName", "   ".join(words[:2]))]
+    for (mode, term), (other_mode, other_term) in zip(same[::2], same[1::2]):
+        assert repo.search_key(mode, term) == repo.search_key(other_mode, other_term)
+        assert (repo.search(mode, term).fetch_first(2000)
+                == repo.search(other_mode, other_term).fetch_first(2000))
+    assert repo.search_key("by FullName", words[0]) != repo.search_key("All", "")
+    assert repo.search_key("by ItemStatus", "completed") != repo.search_key("by ItemStatus", "completed ")
+
+def _expected_order(rows, sort, descending):
+    # NULLs first ascending (last descending), ties broken by id
+    index = TaskRow._fields.index(sort)
+    return [row.id for row in sorted(rows, key=lambda r: (r[index] is not None, r[index], r.id),
+                                     reverse=descending)]
+
+@pytest.mark.parametrize("sort", ["InStock", "price", "FullName", "ItemGroup"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_paging_under_column_sort(repo, db, sort, descending):
+    with db.get_connection() as conn:
+        # NULLs and many ties, the cases keysets get wrong
+        conn.execute("UPDATE tasks SET InStock = NULL WHERE id % 7 = 0")
+        conn.execute("UPDATE tasks SET InStock = 3 WHERE id % 7 = 1")
+        conn.commit()
+    query = TaskQuery(db, sort=sort, descending=descending)
+    expected = _expected_order(query.fetch_first(10 ** 6), sort, descending)
+
+    pages = [query.fetch_first(97)]
+    while pages[-1]:
+        pages.append(query.fetch_after(pages[-1][-1], 97))
+    assert [row.id for page in pages for row in page] == expected
+
+    backwards = [query.fetch_before(pages[-2][-1], 97)]
+    while backwards[-1]:
+        backwards.append(query.fetch_before(backwards[-1][0], 97))
+    assert [row.id for page in reversed(backwards) for row in page] == expected[:-1]
+
+def test_batch_writes(repo):
+    rows = repo.list_page(limit=40)
+    ids = [row.id for row in rows]
+    before = {row.id: row for row in rows}
+
+    repo.complete_many(ids[:10])
+    repo.adjust_stock_many(ids[10:20], -2)
+    repo.set_price_many(ids[20:30], price=9.99, pvn="0")
+    deleted = repo.delete_many(ids[30:])
+
+    after = TaskQuery(repo.db).fetch_rows(ids)
+    assert all(after[i].ItemStatus == "completed" for i in ids[:10])
+    assert all(after[i].InStock == before[i].InStock - 2 for i in ids[10:20])
+    assert all((after[i].price, after[i].pvn) == (9.99, "0") for i in ids[20:30])
+    assert deleted == {i: before[i].FullName for i in ids[30:]}
+    assert not set(after) & set(ids[30:])
+    assert not any(before[i].barcode in repo.barcodes for i in ids[30:])
+
+def test_batch_on_whole_result(repo, monkeypatch):
+    name = repo.list_page(limit=1)[0].FullName
+    queries = [repo.search("All", "", "price", False, {"InStock": ">5"}),
+               repo.search("by FullName", name.split()[0])]
+    # Matches past the rank limit are paged by id instead
+    monkeypatch.setattr(task_repository, "FTS_RANK_LIMIT", 10)
+    queries.append(repo.search("by FullName", name[0]))
+    assert queries[1].ranked_ids is not None and queries[2].ranked_ids is None
+    for query in queries:
+        ids = query.fetch_ids()
+        assert sorted(ids) == sorted(row.id for row in query.fetch_first(10 ** 6))
+        assert len(ids) == query.count() > 0
+
+    ids = queries[0].fetch_ids()
+    repo.set_price_many(ids, price=4.56)
+    repo.set_status_many(ids, "archived")
+    rows = TaskQuery(repo.db).fetch_rows(ids)
+    assert all((row.price, row.ItemStatus) == (4.56, "archived") for row in rows.values())
+
+def _read_delta(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        lines = list(csv.reader(f))[1:]
+    return ({int(line[0]) for line in lines if line[-1] == "U"},
+            {int(line[0]) for line in lines if line[-1] == "D"})
+
+def test_delta_export(repo, tmp_path):
+    full, delta = str(tmp_path / "full.csv"), str(tmp_path / "delta.csv")
+    total = repo.export_chd3050u(full)
+    rows = repo.list_page(limit=10)
+    ids = [row.id for row in rows]
+
+    # Only fields on the device count: stock changes are left out
+    repo.adjust_stock_many(ids[:2], 5)
+    row = rows[2]
+    repo.update_many([TaskUpdate(row.id, "Renamed", row.category_id, row.ItemSuplier,
+                                 row.InStock, row.price, row.pvn)])
+    repo.set_price_many(ids[3:5], price=1.23)
+    repo.delete_many(ids[5:7])
+    added = repo.add_many([NewTask("Added", row.category_id, "Supplier", 1, 2.0, row.pvn)])
+
+    result = repo.export_chd3050u_delta(delta)
+    assert (result.changed, result.deleted, result.full) == (4, 2, False)
+    assert _read_delta(delta) == ({ids[2], ids[3], ids[4], added[0]}, set(ids[5:7]))
+
+    # Nothing changed since: the file is left as it was
+    with open(delta, "rb") as f:
+        written = f.read()
+    result = repo.export_chd3050u_delta(delta)
+    assert (result.changed, result.deleted, result.full) == (0, 0, False)
+    with open(delta, "rb") as f:
+        assert f.read() == written
+
+    # A target never exported gets everything
+    result = repo.export_chd3050u_delta(str(tmp_path / "other.csv"), target="other")
+    assert (result.changed, result.deleted, result.full) == (total - 2 + 1, 0, True)
+
+def test_stock_edit_is_not_a_delta(repo, tmp_path):
+    repo.export_chd3050u(str(tmp_path / "full.csv"))
+    row = repo.list_page(limit=1)[0]
+    # The edit form writes every field back, unchanged ones included
+    repo.update_many([TaskUpdate(row.id, row.FullName, row.category_id, row.ItemSuplier,
+                                 row.InStock + 10, row.price, row.pvn, row.barcode, row.barcode_type)])
+    result = repo.export_chd3050u_delta(str(tmp_path / "delta.csv"))
+    assert (result.changed, result.deleted) == (0, 0)
+
+    repo.update_many([TaskUpdate(row.id, row.FullName, row.category_id, row.ItemSuplier,
+                                 row.InStock, row.price + 1, row.pvn)])
+    result = repo.export_chd3050u_delta(str(tmp_path / "delta.csv"))
+    assert (result.changed, result.deleted) == (1, 0)